@@ -25,8 +25,11 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_pre_ping": True,
 }
 
-# Configure session for storing OAuth tokens
-app.config['SESSION_TYPE'] = 'filesystem'
+# Configure server-side sessions: only a signed session id is sent in the
+# cookie. 'sqlalchemy' keeps them in the database so every autoscaled
+# instance shares them; 'filesystem' keeps them in the instance folder and
+# only suits a single host.
+app.config['SESSION_TYPE'] = os.environ.get('SESSION_TYPE', 'sqlalchemy')
 app.config['SESSION_PERMANENT'] = False
 
 # Initialize the app with the extension
@@ -37,8 +40,19 @@ with app.app_context():
     # Import models so their tables are created
     import models  # noqa: F401
     
-    # Create all tables
+    # Create all tables, then add columns and indexes declared since the tables were created
     db.create_all()
+    from db_migrations import ensure_columns, ensure_indexes
+    ensure_columns(db)
+    ensure_indexes(db)
+    
+    # Install the server-side session backend
+    from server_session import create_session_interface
+    app.session_interface = create_session_interface(app, db)
+    
+    # Record tracks and artists from Spotify responses in the local catalog
+    import catalog
+    catalog.init_app(app, db)
     
     # Import and register routes
     import routes  # noqa: F401
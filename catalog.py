@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import select, bindparam, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from spotify_client import add_response_observer
+from track_matcher import normalize_title, normalize_artist
+
+# Catalog objects held between flushes, per worker; beyond this new ones are dropped
+CATALOG_BUFFER_MAX = int(os.environ.get('CATALOG_BUFFER_MAX', 5000))
+# Seconds between background flushes, per worker
+CATALOG_FLUSH_INTERVAL = float(os.environ.get('CATALOG_FLUSH_INTERVAL', 5))
+
+
+def match_key(title, artist):
+    """Lookup key shared by catalog writes and reads, e.g. 'testify|rage against the machine'"""
+    return f'{normalize_title(title)}|{normalize_artist(artist)}'[:512]
+
+
+def _track_row(track):
+    album = track.get('album') or {}
+    images = album.get('images') or []
+    artists = track.get('artists') or [{}]
+    # Only present on objects fetched without a market; searches leave it out
+    markets = track.get('available_markets')
+    return {
+        'id': track['id'],
+        'name': track.get('name') or '',
+        'artist_id': artists[0].get('id'),
+        'artist_name': artists[0].get('name'),
+        'album_name': album.get('name'),
+        'album_image_url': images[0].get('url') if images else None,
+        'uri': track.get('uri') or f"spotify:track:{track['id']}",
+        'external_url': (track.get('external_urls') or {}).get('spotify'),
+        'preview_url': track.get('preview_url'),
+        'popularity': track.get('popularity'),
+        'duration_ms': track.get('duration_ms'),
+        'available_markets': ','.join(markets) if markets is not None else None,
+        'match_key': match_key(track.get('name'), artists[0].get('name'))
+    }
+
+
+def _artist_row(artist):
+    images = artist.get('images') or []
+    # Simplified artists (inside tracks) carry no genres; leave them unknown rather than empty
+    genres = artist.get('genres')
+    return {
+        'id': artist['id'],
+        'name': artist.get('name') or '',
+        'genres': json.dumps(genres) if genres is not None else None,
+        'popularity': artist.get('popularity'),
+        'image_url': images[0].get('url') if images else None
+    }
+
+
+def _merge(existing, row):
+    """Combine two rows for the same id, keeping every field either one knows"""
+    if existing is None:
+        return row
+    return {key: row[key] if row[key] is not None else existing.get(key) for key in row}
+
+
+class CatalogBuffer:
+    """Collects track and artist objects from Spotify responses for the catalog.
+
+    Observing a response only walks it and records rows in memory, so it is
+    cheap enough to run on every API call, from any thread. A background
+    thread per worker writes the rows in one transaction every
+    ``flush_interval`` seconds, so no request waits for catalog writes.
+    """
+
+    def __init__(self, max_entries=CATALOG_BUFFER_MAX, flush_interval=CATALOG_FLUSH_INTERVAL):
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.flusher_pid = None
+        self.lock = threading.Lock()
+        self.tracks = {}
+        self.artists = {}
+        self.engine = None
+        self.flushed_tracks = 0
+        self.flushed_artists = 0
+        self.dropped = 0
+        self.lookups = 0
+        self.hits = 0
+
+    def observe(self, payload):
+        tracks = []
+        artists = []
+        self._walk(payload, tracks, artists)
+        if not tracks and not artists:
+            return
+
+        with self.lock:
+            for buffer, rows in ((self.tracks, tracks), (self.artists, artists)):
+                for row in rows:
+                    if row['id'] not in buffer and len(self.tracks) + len(self.artists) >= self.max_entries:
+                        self.dropped += 1
+                        continue
+                    buffer[row['id']] = _merge(buffer.get(row['id']), row)
+        self._ensure_flusher()
+
+    def _ensure_flusher(self):
+        # Started lazily and per process, so forked gunicorn workers each get one
+        pid = os.getpid()
+        if self.flusher_pid == pid or self.engine is None:
+            return
+        with self.lock:
+            if self.flusher_pid == pid:
+                return
+            self.flusher_pid = pid
+        threading.Thread(target=self._flush_loop, name='catalog-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _walk(self, node, tracks, artists):
+        if isinstance(node, list):
+            for child in node:
+                self._walk(child, tracks, artists)
+            return
+        if not isinstance(node, dict):
+            return
+
+        kind = node.get('type')
+        # Tracks nested in albums have no album of their own; only full tracks are useful
+        if kind == 'track' and node.get('id') and 'album' in node:
+            tracks.append(_track_row(node))
+        elif kind == 'artist' and node.get('id'):
+            artists.append(_artist_row(node))
+
+        for value in node.values():
+            if isinstance(value, (dict, list)):
+                self._walk(value, tracks, artists)
+
+    def flush(self):
+        """Write buffered rows to the catalog; best effort, failures only cost freshness"""
+        with self.lock:
+            tracks, self.tracks = self.tracks, {}
+            artists, self.artists = self.artists, {}
+        if (not tracks and not artists) or self.engine is None:
+            return
+
+        try:
+            from models import Track, Artist
+            now = datetime.utcnow()
+            with self.engine.begin() as conn:
+                self._upsert(conn, Artist.__table__, artists, now)
+                self._upsert(conn, Track.__table__, tracks, now)
+            with self.lock:
+                self.flushed_tracks += len(tracks)
+                self.flushed_artists += len(artists)
+        except Exception as e:
+            logging.warning(f"Catalog flush failed, keeping {len(tracks) + len(artists)} rows for the next one: {e}")
+            self._requeue(tracks, artists)
+
+    def _requeue(self, tracks, artists):
+        """Put rows from a failed flush back, under anything observed since"""
+        with self.lock:
+            for buffer, rows in ((self.tracks, tracks), (self.artists, artists)):
+                for row_id, row in rows.items():
+                    if row_id in buffer:
+                        buffer[row_id] = _merge(row, buffer[row_id])
+                    elif len(self.tracks) + len(self.artists) < self.max_entries:
+                        buffer[row_id] = row
+                    else:
+                        self.dropped += 1
+
+    def _upsert(self, conn, table, rows, now):
+        """Insert or update every row in one batched statement.
+
+        Never overwrites what a fuller object taught us with a simplified
+        object's blanks: a NULL in the new row keeps the stored value.
+        """
+        if not rows:
+            return
+        values = [dict(row, updated_at=now) for row in rows.values()]
+        columns = [column for column in table.c if column.name != 'id']
+
+        dialect = {'sqlite': sqlite, 'postgresql': postgresql}.get(conn.dialect.name)
+        if dialect is not None:
+            insert = dialect.insert(table)
+            conn.execute(insert.on_conflict_do_update(
+                index_elements=[table.c.id],
+                set_={column.name: func.coalesce(insert.excluded[column.name], column) for column in columns}
+            ), values)
+            return
+
+        # Other databases: one id lookup, then one executemany insert and one executemany update
+        existing = set()
+        ids = list(rows)
+        for start in range(0, len(ids), 500):
+            existing.update(conn.execute(select(table.c.id).where(table.c.id.in_(ids[start:start + 500]))).scalars())
+        new_rows = [row for row in values if row['id'] not in existing]
+        if new_rows:
+            conn.execute(table.insert(), new_rows)
+        updates = [{f'b_{key}': value for key, value in row.items()} for row in values if row['id'] in existing]
+        if updates:
+            conn.execute(
+                table.update()
+                .where(table.c.id == bindparam('b_id'))
+                .values({column.name: func.coalesce(bindparam(f'b_{column.name}'), column) for column in columns}),
+                updates
+            )
+
+    def find_track(self, title, artist, market):
+        """Return a Spotify-shaped track for a title/artist already in the catalog, or None.
+
+        Only tracks known to be available in ``market`` are returned, so a
+        user is never handed a track their country cannot play; without a
+        market the caller has to search.
+        """
+        if self.engine is None or not market:
+            return None
+        from models import Track
+        table = Track.__table__
+        with self.lock:
+            self.lookups += 1
+        try:
+            with self.engine.connect() as conn:
+                row = conn.execute(
+                    table.select()
+                    .where(table.c.match_key == match_key(title, artist))
+                    .where(table.c.available_markets.like(f'%{market}%'))
+                    .order_by(table.c.popularity.desc())
+                    .limit(1)
+                ).first()
+        except Exception as e:
+            logging.warning(f"Catalog lookup failed: {e}")
+            return None
+        if row is None:
+            return None
+
+        with self.lock:
+            self.hits += 1
+        return {
+            'id': row.id,
+            'name': row.name,
+            'artists': [{'id': row.artist_id, 'name': row.artist_name}],
+            'album': {
+                'name': row.album_name,
+                'images': [{'url': row.album_image_url}] if row.album_image_url else []
+            },
+            'uri': row.uri,
+            'external_urls': {'spotify': row.external_url},
+            'preview_url': row.preview_url,
+            'popularity': row.popularity,
+            'duration_ms': row.duration_ms
+        }
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'buffered': len(self.tracks) + len(self.artists),
+                'flushed_tracks': self.flushed_tracks,
+                'flushed_artists': self.flushed_artists,
+                'dropped': self.dropped,
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_ratio': round(self.hits / self.lookups, 3) if self.lookups else 0.0
+            }
+
+
+catalog = CatalogBuffer()
+
+
+def init_app(app, db):
+    """Observe Spotify responses and flush them to the catalog in the background"""
+    # Bound once at startup so flushes and lookups work from any thread
+    catalog.engine = db.engine
+    add_response_observer(catalog.observe)
+    # Rows still buffered when a worker shuts down
+    atexit.register(catalog.flush)
@@ -0,0 +1,158 @@
+import os
+import logging
+
+from sqlalchemy import inspect, text
+
+
+def ensure_columns(db, engine=None):
+    """Add any nullable column declared on the models that the database does not have yet.
+
+    Like indexes, columns added to existing models never reach a deployed
+    database through db.create_all(). Only nullable columns without a
+    server default are added, since those need no backfill. Runs before
+    ensure_indexes, so indexes on new columns can be created. Returns the
+    "table.column" names it added.
+    """
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    added = []
+
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable or column.server_default is not None:
+                continue
+            # Quoted, since table names like "user" are reserved words on PostgreSQL
+            preparer = engine.dialect.identifier_preparer
+            column_type = column.type.compile(dialect=engine.dialect)
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(f'ALTER TABLE {preparer.format_table(table)} '
+                                      f'ADD COLUMN {preparer.format_column(column)} {column_type}'))
+                added.append(f'{table.name}.{column.name}')
+                logging.info(f"Added column {column.name} to {table.name}")
+            except Exception as e:
+                logging.warning(f"Could not add column {column.name} to {table.name}: {e}")
+    return added
+
+
+def ensure_indexes(db, engine=None):
+    """Create any index declared on the models that the database does not have yet.
+
+    db.create_all() only creates indexes together with new tables, so
+    indexes added to existing models would never reach a deployed database.
+    This runs after create_all on every startup and is idempotent: present
+    indexes are skipped, and a worker losing a creation race to another
+    worker only logs it. Returns the names of the indexes it created.
+    """
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    created = []
+
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name in existing:
+                continue
+            try:
+                index.create(bind=engine, checkfirst=True)
+                created.append(index.name)
+                logging.info(f"Created index {index.name} on {table.name}")
+            except Exception as e:
+                logging.warning(f"Could not create index {index.name}: {e}")
+    return created
+
+
+# Hot per-user queries from routes.py, as the SQL they compile to
+HOT_QUERIES = [
+    ('recent recommendations by id',
+     'SELECT * FROM recommendation WHERE user_id = :user_id ORDER BY id DESC LIMIT 10'),
+    ('recent recommendations by time',
+     'SELECT * FROM recommendation WHERE user_id = :user_id ORDER BY created_at DESC LIMIT 20'),
+    ('recommendation count',
+     'SELECT count(*) FROM recommendation WHERE user_id = :user_id'),
+    ('user feedback',
+     'SELECT * FROM user_feedback WHERE user_id = :user_id'),
+    ('recent feedback by time',
+     'SELECT * FROM user_feedback WHERE user_id = :user_id ORDER BY created_at DESC LIMIT 5'),
+    ('feedback for a recommendation',
+     'SELECT * FROM user_feedback WHERE recommendation_id = :recommendation_id'),
+]
+
+
+def explain(conn, sql, params):
+    """Return the database's query plan for ``sql`` as a list of lines"""
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    return [' '.join(str(column) for column in row) for row in conn.execute(text(prefix + sql), params)]
+
+
+def run_benchmark(users=500, recommendations_per_user=40, feedback_per_user=20, repeats=200):
+    """Compare plans and timings of HOT_QUERIES without and with the model indexes.
+
+    Uses a throwaway in-memory SQLite database, so it never touches app data;
+    run as a script, the app it imports for the models is in memory too.
+    """
+    import time
+    import random
+    from datetime import datetime, timedelta
+    from sqlalchemy import create_engine
+    from app import db
+    import models
+
+    engine = create_engine('sqlite://')
+    db.metadata.create_all(engine)
+    # Start from the pre-index schema
+    with engine.begin() as conn:
+        for table in (models.Recommendation.__table__, models.UserFeedback.__table__):
+            for index in table.indexes:
+                conn.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+
+    random.seed(7)
+    start = datetime(2024, 1, 1)
+    recommendations = []
+    feedback = []
+    for n in range(users * recommendations_per_user):
+        recommendations.append({
+            'id': n + 1, 'user_id': f'user{random.randrange(users)}', 'track_name': f'Track {n}',
+            'artist_name': f'Artist {n % 997}', 'track_uri': f'spotify:track:{n}',
+            'created_at': start + timedelta(minutes=n)
+        })
+    for n in range(users * feedback_per_user):
+        rec = random.choice(recommendations)
+        feedback.append({
+            'id': n + 1, 'user_id': rec['user_id'], 'recommendation_id': rec['id'],
+            'feedback_text': 'Loved it' if n % 2 else 'Not for me', 'sentiment': 'positive' if n % 2 else 'negative',
+            'created_at': rec['created_at'] + timedelta(hours=1)
+        })
+    with engine.begin() as conn:
+        conn.execute(models.Recommendation.__table__.insert(), recommendations)
+        conn.execute(models.UserFeedback.__table__.insert(), feedback)
+
+    params = {'user_id': 'user42', 'recommendation_id': recommendations[len(recommendations) // 2]['id']}
+
+    def measure(label):
+        print(f"\n=== {label} ===")
+        with engine.connect() as conn:
+            for name, sql in HOT_QUERIES:
+                query_start = time.perf_counter()
+                for _ in range(repeats):
+                    conn.execute(text(sql), params).fetchall()
+                elapsed_us = (time.perf_counter() - query_start) / repeats * 1e6
+                print(f"{name:32} {elapsed_us:9.1f} us  | {'; '.join(explain(conn, sql, params))}")
+
+    print(f"{len(recommendations)} recommendations, {len(feedback)} feedback rows, {users} users")
+    measure('Before: no per-user indexes')
+    created = ensure_indexes(db, engine)
+    print(f"\nensure_indexes created: {', '.join(created)}")
+    print(f"ensure_indexes again created: {ensure_indexes(db, engine) or 'nothing'}")
+    measure('After: composite indexes')
+
+
+if __name__ == '__main__':
+    # Importing the app creates tables in DATABASE_URL; a script run stays in memory
+    os.environ['DATABASE_URL'] = 'sqlite://'
+    run_benchmark()
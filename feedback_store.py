@@ -0,0 +1,86 @@
+import os
+
+from sqlalchemy import func, case
+
+if __name__ == '__main__':
+    # Importing the app creates tables in DATABASE_URL; a script run stays in memory
+    os.environ['DATABASE_URL'] = 'sqlite://'
+
+from app import db
+from models import User, Recommendation, UserFeedback
+
+# Columns the insight prompts and summaries actually read
+FEEDBACK_WITH_TRACK_COLUMNS = (
+    Recommendation.track_name,
+    Recommendation.artist_name,
+    UserFeedback.feedback_text,
+    UserFeedback.sentiment,
+    UserFeedback.created_at,
+)
+
+
+def _feedback_with_tracks(session):
+    return session.query(*FEEDBACK_WITH_TRACK_COLUMNS)\
+                     .join(Recommendation, UserFeedback.recommendation_id == Recommendation.id)
+
+
+def recent_feedback_with_tracks(user_id, limit=10, session=None):
+    """A user's newest feedback joined with the recommended track, in one query"""
+    return _feedback_with_tracks(session or db.session)\
+        .filter(UserFeedback.user_id == user_id)\
+        .order_by(UserFeedback.created_at.desc(), UserFeedback.id.desc())\
+        .limit(limit)\
+        .all()
+
+
+def sentiment_counts(user_id, session=None):
+    """Count a user's feedback by sentiment in one aggregate query, without loading rows"""
+    sentiment = func.lower(UserFeedback.sentiment)
+    total, positive, negative = (session or db.session).query(
+        func.count(UserFeedback.id),
+        func.count(case((sentiment.like('%positive%'), 1))),
+        func.count(case((sentiment.like('%negative%'), 1)))
+    ).filter(UserFeedback.user_id == user_id).one()
+    return {'total': total, 'positive': positive, 'negative': negative}
+
+
+def run_query_count_check(feedback_per_user=30):
+    """Assert the feedback paths run a constant number of queries however much history exists.
+
+    Uses a throwaway in-memory SQLite database, so it never touches app data.
+    """
+    from datetime import datetime, timedelta
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from query_counter import assert_max_queries
+
+    engine = create_engine('sqlite://')
+    db.metadata.create_all(engine)
+    user_id = 'query-count-check'
+
+    with Session(engine) as session:
+        session.add(User(id=user_id))
+        for n in range(feedback_per_user):
+            recommendation = Recommendation(
+                user_id=user_id, track_name=f'Track {n}', artist_name=f'Artist {n}',
+                track_uri=f'spotify:track:check{n}'
+            )
+            session.add(recommendation)
+            session.flush()
+            session.add(UserFeedback(
+                user_id=user_id, recommendation_id=recommendation.id, feedback_text='ok',
+                sentiment='positive', created_at=datetime(2024, 1, 1) + timedelta(minutes=n)
+            ))
+        session.flush()
+
+        with assert_max_queries(engine, 1) as counter:
+            rows = recent_feedback_with_tracks(user_id, limit=10, session=session)
+        print(f"recent_feedback_with_tracks: {len(rows)} rows in {counter.count} query")
+
+        with assert_max_queries(engine, 1) as counter:
+            counts = sentiment_counts(user_id, session=session)
+        print(f"sentiment_counts: {counts} in {counter.count} query")
+
+
+if __name__ == '__main__':
+    run_query_count_check()
@@ -0,0 +1,41 @@
+import os
+import threading
+from collections import OrderedDict
+
+import google.generativeai as genai
+from google.ai import generativelanguage as glm
+
+# Gemini clients kept per API key, least recently used dropped first
+GEMINI_CLIENT_CACHE_SIZE = int(os.environ.get('GEMINI_CLIENT_CACHE_SIZE', 64))
+
+_clients = OrderedDict()
+_clients_lock = threading.Lock()
+
+
+def _client_for(api_key):
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is not None:
+            _clients.move_to_end(api_key)
+            return client
+
+    client = glm.GenerativeServiceClient(client_options={'api_key': api_key})
+    with _clients_lock:
+        client = _clients.setdefault(api_key, client)
+        _clients.move_to_end(api_key)
+        while len(_clients) > GEMINI_CLIENT_CACHE_SIZE:
+            _clients.popitem(last=False)
+    return client
+
+
+def get_model(api_key, model_name, **kwargs):
+    """Return a GenerativeModel whose calls are billed to ``api_key``.
+
+    genai.configure() sets one key for the whole process, so with threaded
+    workers one user's request could run on another user's key. Each model
+    here carries a client built for its own key instead; clients are reused
+    per key so connections stay warm.
+    """
+    model = genai.GenerativeModel(model_name, **kwargs)
+    model._client = _client_for(api_key)
+    return model
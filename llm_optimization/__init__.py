@@ -0,0 +1,10 @@
+"""Lightning mode building blocks: caching, data collection and LLM orchestration"""
+from llm_optimization.cache import CacheManager, cache_manager
+from llm_optimization.collector import DataOptimizer, data_optimizer
+from llm_optimization.lightning import HyperOptimizedLLMManager, hyper_optimized_llm_manager
+
+__all__ = [
+    'CacheManager', 'cache_manager',
+    'DataOptimizer', 'data_optimizer',
+    'HyperOptimizedLLMManager', 'hyper_optimized_llm_manager'
+]
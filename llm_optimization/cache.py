@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from ttl_cache import TTLCache, MISSING
+
+# In-process tier: memory cap per gunicorn worker
+LLM_CACHE_MAX_BYTES = int(os.environ.get('LLM_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+# Shared tier: a database table every worker reads and writes
+LLM_CACHE_SHARED = os.environ.get('LLM_CACHE_SHARED', 'true').lower() in ('1', 'true', 'yes')
+LLM_CACHE_SWEEP_INTERVAL = 600
+
+# Seconds each kind of cached data stays fresh
+DEFAULT_TTLS = {
+    'music_data': 600,
+    'user_profile': 1800,
+}
+DEFAULT_TTL = 600
+
+
+class CacheManager:
+    """Two-tier cache for Lightning mode data.
+    
+    Reads check the worker's in-process LRU first, then the shared table, so
+    data collected by one gunicorn worker is reused by the others. The shared
+    tier is best effort: if the database is unavailable the cache keeps
+    working in-process only.
+    """
+    
+    def __init__(self, max_bytes=LLM_CACHE_MAX_BYTES, shared=LLM_CACHE_SHARED):
+        self.local = TTLCache(max_bytes, default_ttl=DEFAULT_TTL, name='llm_local')
+        self.shared = shared
+        self.lock = threading.Lock()
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self.shared_writes = 0
+        self.shared_errors = 0
+        self.last_sweep = time.monotonic()
+    
+    def _key(self, user_id, data_type):
+        return f'{user_id}:{data_type}'
+    
+    def _table(self):
+        from models import CacheEntry
+        return CacheEntry.__table__
+    
+    def _engine(self):
+        from app import db
+        return db.engine
+    
+    def get_cached_data(self, user_id, data_type):
+        """Return cached data for a user, or None on a miss"""
+        key = self._key(user_id, data_type)
+        value = self.local.get(key)
+        if value is not MISSING:
+            return value
+        
+        if not self.shared:
+            return None
+        
+        try:
+            table = self._table()
+            with self._engine().connect() as conn:
+                row = conn.execute(table.select().where(table.c.cache_key == key)).first()
+        except Exception as e:
+            self._shared_failed('read', e)
+            return None
+        
+        now = datetime.utcnow()
+        if row is None or row.expires_at <= now:
+            with self.lock:
+                self.shared_misses += 1
+            return None
+        
+        with self.lock:
+            self.shared_hits += 1
+        value = json.loads(row.value)
+        # Promote into this worker's tier for the rest of the entry's lifetime
+        self.local.set(key, value, ttl=(row.expires_at - now).total_seconds(), size=row.size_bytes)
+        return value
+    
+    def cache_data(self, user_id, data_type, data, ttl=None):
+        """Cache data for a user in both tiers"""
+        ttl = DEFAULT_TTLS.get(data_type, DEFAULT_TTL) if ttl is None else ttl
+        key = self._key(user_id, data_type)
+        payload = json.dumps(data, separators=(',', ':'))
+        self.local.set(key, data, ttl=ttl, size=len(payload))
+        
+        if not self.shared:
+            return
+        
+        try:
+            table = self._table()
+            values = {
+                'value': payload,
+                'size_bytes': len(payload),
+                'expires_at': datetime.utcnow() + timedelta(seconds=ttl)
+            }
+            with self._engine().begin() as conn:
+                result = conn.execute(table.update().where(table.c.cache_key == key).values(**values))
+                if result.rowcount == 0:
+                    conn.execute(table.insert().values(cache_key=key, **values))
+            with self.lock:
+                self.shared_writes += 1
+        except Exception as e:
+            self._shared_failed('write', e)
+            return
+        
+        self._maybe_sweep()
+    
+    def invalidate(self, user_id, data_type=None):
+        """Drop one data type, or everything, cached for a user"""
+        prefix = self._key(user_id, data_type or '')
+        if data_type:
+            self.local.delete(prefix)
+        else:
+            self.local.delete_where(lambda key: key.startswith(prefix))
+        
+        if not self.shared:
+            return
+        try:
+            table = self._table()
+            condition = table.c.cache_key == prefix if data_type else table.c.cache_key.startswith(prefix, autoescape=True)
+            with self._engine().begin() as conn:
+                conn.execute(table.delete().where(condition))
+        except Exception as e:
+            self._shared_failed('delete', e)
+    
+    def _maybe_sweep(self):
+        with self.lock:
+            if time.monotonic() - self.last_sweep < LLM_CACHE_SWEEP_INTERVAL:
+                return
+            self.last_sweep = time.monotonic()
+        try:
+            table = self._table()
+            with self._engine().begin() as conn:
+                conn.execute(table.delete().where(table.c.expires_at <= datetime.utcnow()))
+        except Exception as e:
+            self._shared_failed('sweep', e)
+    
+    def _shared_failed(self, operation, error):
+        with self.lock:
+            self.shared_errors += 1
+        logging.warning(f"Shared cache {operation} failed, using in-process tier only: {error}")
+    
+    def get_cache_stats(self):
+        """Report entries, memory, evictions and hit ratios for both tiers"""
+        local_stats = self.local.get_stats()
+        with self.lock:
+            shared_hits = self.shared_hits
+            shared_misses = self.shared_misses
+            shared_writes = self.shared_writes
+            shared_errors = self.shared_errors
+        
+        # Every lookup starts locally; local misses fall through to the shared tier
+        lookups = local_stats['hits'] + local_stats['misses']
+        hits = local_stats['hits'] + shared_hits
+        return {
+            'cached_entries': local_stats['entries'],
+            'memory_bytes': local_stats['memory_bytes'],
+            'max_bytes': local_stats['max_bytes'],
+            'evictions': local_stats['evictions'],
+            'expirations': local_stats['expirations'],
+            'hit_ratio': round(hits / lookups, 3) if lookups else 0.0,
+            'local': local_stats,
+            'shared': {
+                'enabled': self.shared,
+                'hits': shared_hits,
+                'misses': shared_misses,
+                'writes': shared_writes,
+                'errors': shared_errors
+            }
+        }
+
+
+cache_manager = CacheManager()
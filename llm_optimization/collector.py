@@ -0,0 +1,132 @@
+import json
+import time
+import hashlib
+from collections import Counter
+
+from spotify_client import fetch_concurrently
+
+# Items kept per view; prompts only ever look at the head of each list
+RECENT_TRACKS_LIMIT = 20
+TOP_ITEMS_LIMIT = 10
+TOP_GENRES_LIMIT = 10
+
+
+def _project_artist(artist):
+    return {
+        'id': artist.get('id'),
+        'name': artist.get('name'),
+        'genres': list(artist.get('genres', [])),
+        'popularity': artist.get('popularity', 0)
+    }
+
+
+def _project_track(track):
+    artists = track.get('artists') or [{}]
+    return {
+        'id': track.get('id'),
+        'name': track.get('name'),
+        'artist': artists[0].get('name'),
+        'artist_id': artists[0].get('id'),
+        'popularity': track.get('popularity', 0)
+    }
+
+
+def _items(response):
+    if isinstance(response, dict):
+        return [item for item in response.get('items', []) if item]
+    return []
+
+
+class DataOptimizer:
+    """Collects the Spotify views Lightning mode needs, already trimmed for prompts.
+    
+    Raw API payloads are projected straight into a compact schema and then
+    dropped. The output contains no timestamps and no ordering that depends
+    on which request finished first, so identical listening data always
+    serializes - and therefore fingerprints - identically.
+    """
+    
+    def collect_optimized_spotify_data(self, spotify_client, timings=None):
+        """Fetch and project the user's listening data.
+        
+        Pass a dict as ``timings`` to receive per-call and total durations in
+        seconds; they are kept out of the returned data so it hashes stably.
+        """
+        start_time = time.time()
+        call_durations = {}
+        
+        def timed(name, call):
+            def run():
+                call_start = time.time()
+                try:
+                    return call()
+                finally:
+                    call_durations[name] = round(time.time() - call_start, 3)
+            return run
+        
+        fetched = fetch_concurrently({
+            'recent_tracks': timed('recent_tracks', lambda: spotify_client.get_recently_played(limit=30)),
+            'top_artists_short': timed('top_artists_short', lambda: spotify_client.get_top_artists(time_range='short_term', limit=15)),
+            'top_artists_medium': timed('top_artists_medium', lambda: spotify_client.get_top_artists(time_range='medium_term', limit=15)),
+            'top_tracks_short': timed('top_tracks_short', lambda: spotify_client.get_top_tracks(time_range='short_term', limit=15)),
+            'top_tracks_medium': timed('top_tracks_medium', lambda: spotify_client.get_top_tracks(time_range='medium_term', limit=15))
+        })
+        fetch_duration = time.time() - start_time
+        
+        project_start = time.time()
+        music_data = self.project(fetched)
+        project_duration = time.time() - project_start
+        
+        if timings is not None:
+            timings.update({
+                'fetch_duration': round(fetch_duration, 3),
+                'project_duration': round(project_duration, 3),
+                'total_duration': round(time.time() - start_time, 3),
+                'calls': dict(sorted(call_durations.items())),
+                'missing_views': sorted(name for name, value in fetched.items() if value is None)
+            })
+        return music_data
+    
+    def project(self, fetched):
+        """Project raw Spotify responses into the compact Lightning schema"""
+        recent_tracks = []
+        seen_track_ids = set()
+        for item in _items(fetched.get('recent_tracks')):
+            track = item.get('track') or {}
+            # Recently played repeats tracks; one entry per track is enough
+            if not track.get('name') or track.get('id') in seen_track_ids:
+                continue
+            seen_track_ids.add(track.get('id'))
+            recent_tracks.append(_project_track(track))
+            if len(recent_tracks) >= RECENT_TRACKS_LIMIT:
+                break
+        
+        top_artists_recent = [_project_artist(a) for a in _items(fetched.get('top_artists_short'))[:TOP_ITEMS_LIMIT]]
+        top_artists_overall = [_project_artist(a) for a in _items(fetched.get('top_artists_medium'))[:TOP_ITEMS_LIMIT]]
+        
+        genre_counts = Counter(
+            genre
+            for artist in top_artists_recent + top_artists_overall
+            for genre in artist['genres']
+        )
+        # Rank by frequency, break ties alphabetically so the order is stable
+        top_genres = [
+            genre for genre, count in sorted(genre_counts.items(), key=lambda item: (-item[1], item[0]))
+        ][:TOP_GENRES_LIMIT]
+        
+        return {
+            'recent_tracks': recent_tracks,
+            'top_artists_recent': top_artists_recent,
+            'top_artists_overall': top_artists_overall,
+            'top_tracks_recent': [_project_track(t) for t in _items(fetched.get('top_tracks_short'))[:TOP_ITEMS_LIMIT]],
+            'top_tracks_overall': [_project_track(t) for t in _items(fetched.get('top_tracks_medium'))[:TOP_ITEMS_LIMIT]],
+            'top_genres': top_genres
+        }
+    
+    def fingerprint(self, music_data):
+        """Stable hash of collected data, for use in cache keys"""
+        canonical = json.dumps(music_data, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+data_optimizer = DataOptimizer()
@@ -0,0 +1,126 @@
+import json
+import time
+import logging
+
+from llm_optimization.cache import cache_manager
+from llm_optimization.collector import data_optimizer
+
+LIGHTNING_MODEL = 'gemini-1.5-flash'
+# A profile only changes when the underlying listening data does
+PROFILE_CACHE_TTL = 1800
+
+
+class HyperOptimizedLLMManager:
+    """Orchestrates the LLM calls behind a Lightning recommendation.
+    
+    The user profile call is cached per data fingerprint, so it only runs
+    when the user's listening data actually changed. The recommendation call
+    asks for JSON and returns the song and artist as structured fields, so
+    callers only parse free text when the model ignores that format.
+    """
+    
+    def _model(self, gemini_api_key, json_output=False):
+        # Bound to this user's key; genai.configure would switch the key for every thread
+        from gemini_client import get_model
+        generation_config = {'response_mime_type': 'application/json'} if json_output else None
+        return get_model(gemini_api_key, LIGHTNING_MODEL, generation_config=generation_config)
+    
+    def get_user_profile(self, music_data, gemini_api_key, user_id=None):
+        """Return (profile_text, was_cached) for the given listening data"""
+        cache_type = f'user_profile:{data_optimizer.fingerprint(music_data)}'
+        cache_owner = user_id or 'anonymous'
+        
+        cached_profile = cache_manager.get_cached_data(cache_owner, cache_type)
+        if cached_profile:
+            return cached_profile, True
+        
+        prompt = f"""Summarize this listener's music taste in 2-3 sentences. Mention their core genres, signature artists and current mood.
+
+LISTENING DATA:
+{json.dumps(music_data, separators=(',', ':'))}
+
+Respond with the summary text only."""
+        
+        response = self._model(gemini_api_key).generate_content(prompt)
+        profile = response.text.strip() if response and response.text else ''
+        if not profile:
+            raise ValueError("Empty profile response")
+        
+        cache_manager.cache_data(cache_owner, cache_type, profile, ttl=PROFILE_CACHE_TTL)
+        return profile, False
+    
+    def _recommendation_prompt(self, music_data, user_profile, session_adjustment, recent_recommendations):
+        recent_tracks = [f"{track['name']} by {track['artist']}" for track in music_data.get('recent_tracks', [])[:10]]
+        adjustment = f"\nSESSION REQUEST: {session_adjustment}\n" if session_adjustment else ''
+        
+        return f"""Recommend ONE real song available on Spotify for this listener.
+
+PROFILE: {user_profile}
+TOP GENRES: {', '.join(music_data.get('top_genres', []))}
+RECENTLY PLAYED: {recent_tracks}
+{adjustment}
+DO NOT RECOMMEND (already suggested): {recent_recommendations or []}
+
+Respond with JSON only:
+{{"song_title": "exact song title", "artist_name": "primary artist name", "reasoning": "one sentence on why it fits"}}"""
+    
+    def _structured_fields(self, text):
+        """Return (song_title, artist_name, reasoning) from a JSON reply, blanks if it is not one"""
+        try:
+            recommendation = json.loads(text)
+        except ValueError:
+            return '', '', ''
+        if not isinstance(recommendation, dict):
+            return '', '', ''
+        return tuple(str(recommendation.get(key) or '').strip() for key in ('song_title', 'artist_name', 'reasoning'))
+    
+    def get_lightning_recommendation(self, music_data, gemini_api_key, session_adjustment='',
+                                     recent_recommendations=None, user_id=None):
+        """Generate a recommendation with structured song/artist fields and timing stats.
+        
+        If the reply is not the requested JSON, the raw text is returned with
+        song_title and artist_name set to None, for the caller to parse.
+        """
+        try:
+            profile_start = time.time()
+            user_profile, cached_profile = self.get_user_profile(music_data, gemini_api_key, user_id)
+            profile_duration = time.time() - profile_start
+            
+            rec_start = time.time()
+            prompt = self._recommendation_prompt(music_data, user_profile, session_adjustment, recent_recommendations)
+            response = self._model(gemini_api_key, json_output=True).generate_content(prompt)
+            rec_duration = time.time() - rec_start
+            
+            recommendation_text = (response.text or '').strip() if response else ''
+            if not recommendation_text:
+                raise ValueError("Empty recommendation response")
+            
+            song_title, artist_name, reasoning = self._structured_fields(recommendation_text)
+            if song_title and artist_name:
+                recommendation_text = f'"{song_title}" by {artist_name}' + (f' - {reasoning}' if reasoning else '')
+            else:
+                # The model ignored the JSON format; the caller parses the free text instead
+                logging.warning(f"Lightning recommendation was not structured: {recommendation_text[:200]}")
+            
+            return {
+                'success': True,
+                'recommendation': recommendation_text,
+                'song_title': song_title or None,
+                'artist_name': artist_name or None,
+                'reasoning': reasoning,
+                'user_profile': user_profile,
+                'stats': {
+                    'profile_duration': profile_duration,
+                    'rec_duration': rec_duration,
+                    'total_llm_duration': (0 if cached_profile else profile_duration) + rec_duration,
+                    'models_used': [LIGHTNING_MODEL],
+                    'cached_profile': cached_profile
+                }
+            }
+        
+        except Exception as e:
+            logging.error(f"Lightning recommendation failed: {e}")
+            return {'success': False, 'error': str(e)}
+
+
+hyper_optimized_llm_manager = HyperOptimizedLLMManager()
@@ -27,6 +27,12 @@ class User(db.Model):
 
 
 class Recommendation(db.Model):
+    __table_args__ = (
+        # Per-user history, newest first, by time or by id
+        db.Index('ix_recommendation_user_created', 'user_id', 'created_at'),
+        db.Index('ix_recommendation_user_id_id', 'user_id', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.String(50), db.ForeignKey('user.id'), nullable=False)
     track_name = db.Column(db.String(255), nullable=False)
@@ -46,13 +52,83 @@ class Recommendation(db.Model):
 
 
 class UserFeedback(db.Model):
+    __table_args__ = (
+        db.Index('ix_user_feedback_user_created', 'user_id', 'created_at'),
+        db.Index('ix_user_feedback_user_id_id', 'user_id', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.String(50), db.ForeignKey('user.id'), nullable=False)
-    recommendation_id = db.Column(db.Integer, db.ForeignKey('recommendation.id'), nullable=False)
+    recommendation_id = db.Column(db.Integer, db.ForeignKey('recommendation.id'), nullable=False, index=True)
     feedback_text = db.Column(db.Text, nullable=False)
     sentiment = db.Column(db.String(20))  # positive, negative, neutral
-    ai_processed_feedback = db.Column(db.Text)  # AI analysis of the feedback
+    # AI analysis of the feedback; large and never read on hot paths, so loaded only on access
+    ai_processed_feedback = db.deferred(db.Column(db.Text))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def __repr__(self):
         return f'<UserFeedback {self.id}: {self.sentiment}>'
+
+
+class MusicTasteProfile(db.Model):
+    """Server-side cache of a user's AI music taste profile, shared by all workers"""
+    user_id = db.Column(db.String(50), db.ForeignKey('user.id'), primary_key=True)
+    profile_json = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<MusicTasteProfile {self.user_id}>'
+
+
+class ServerSession(db.Model):
+    sid = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.Text, nullable=False)  # Tagged JSON of the Flask session
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<ServerSession {self.sid[:8]}>'
+
+
+class CacheEntry(db.Model):
+    cache_key = db.Column(db.String(255), primary_key=True)  # "<user_id>:<data_type>"
+    value = db.Column(db.Text, nullable=False)  # JSON payload
+    size_bytes = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<CacheEntry {self.cache_key}>'
+
+
+class Artist(db.Model):
+    """Catalog entry for a Spotify artist, filled from API responses the app sees"""
+    id = db.Column(db.String(64), primary_key=True)  # Spotify artist ID
+    name = db.Column(db.String(255), nullable=False)
+    genres = db.Column(db.Text)  # JSON list; NULL until a full artist object is seen
+    popularity = db.Column(db.Integer)
+    image_url = db.Column(db.String(255))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Artist {self.name}>'
+
+
+class Track(db.Model):
+    """Catalog entry for a Spotify track, filled from API responses the app sees"""
+    id = db.Column(db.String(64), primary_key=True)  # Spotify track ID
+    name = db.Column(db.String(255), nullable=False)
+    artist_id = db.Column(db.String(64))  # Primary artist; may not be in the artist table yet
+    artist_name = db.Column(db.String(255))
+    album_name = db.Column(db.String(255))
+    album_image_url = db.Column(db.String(255))
+    uri = db.Column(db.String(255), nullable=False)
+    external_url = db.Column(db.String(255))
+    preview_url = db.Column(db.String(255))
+    popularity = db.Column(db.Integer)
+    duration_ms = db.Column(db.Integer)
+    available_markets = db.Column(db.Text)  # Comma-separated country codes; NULL until an object listing them is seen
+    match_key = db.Column(db.String(512), index=True)  # "<normalized title>|<normalized artist>"
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Track {self.name} by {self.artist_name}>'
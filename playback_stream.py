@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+
+from spotify_client import SpotifyClient
+
+# Poll intervals in seconds: fast while something is playing, slow while
+# paused or idle. Pollers stop as soon as the last tab disconnects.
+PLAYBACK_POLL_PLAYING = float(os.environ.get('PLAYBACK_POLL_PLAYING', 3))
+PLAYBACK_POLL_PAUSED = float(os.environ.get('PLAYBACK_POLL_PAUSED', 15))
+PLAYBACK_POLL_IDLE = float(os.environ.get('PLAYBACK_POLL_IDLE', 30))
+PLAYBACK_STREAM_HEARTBEAT = 15
+# Streams end after this many seconds and the browser reconnects, so a
+# stream never holds its server thread for long
+PLAYBACK_STREAM_MAX_AGE = int(os.environ.get('PLAYBACK_STREAM_MAX_AGE', 5 * 60))
+# Open streams per worker. Each holds one gthread thread, so this stays well
+# below --threads; tabs beyond it are told to poll /api/current-track instead
+PLAYBACK_STREAM_MAX_CONCURRENT = int(os.environ.get('PLAYBACK_STREAM_MAX_CONCURRENT', 3))
+
+
+def diff_snapshots(old, new):
+    """Return the parts of ``new`` that differ from ``old``.
+    
+    Nested dicts are diffed recursively, any other changed value is sent
+    whole and keys that disappeared are sent as None, so the client can
+    rebuild ``new`` by deep-merging the diff into ``old``.
+    """
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return new
+    
+    changes = {}
+    for key, value in new.items():
+        if key not in old:
+            changes[key] = value
+        elif old[key] != value:
+            changes[key] = diff_snapshots(old[key], value)
+    for key in old:
+        if key not in new:
+            changes[key] = None
+    return changes
+
+
+def format_event(event, data):
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class _UserPoller:
+    def __init__(self, user_id, token_provider):
+        self.user_id = user_id
+        self.token_provider = token_provider
+        self.subscribers = set()
+        self.snapshot = None
+        self.wake = threading.Event()
+        self.thread = None
+
+
+class PlaybackBroker:
+    """Polls Spotify once per user and fans playback changes out to every open tab"""
+    
+    def __init__(self):
+        self.pollers = {}
+        self.lock = threading.Lock()
+        self.upstream_polls = 0
+        self.open_streams = 0
+        self.rejected_streams = 0
+    
+    def subscribe(self, user_id, token_provider):
+        """Register a listener queue for ``user_id``, starting its poller if needed.
+        
+        ``token_provider`` is called from the poller thread and must return a
+        valid access token (refreshing it if necessary) or None to stop.
+        """
+        listener = queue.Queue(maxsize=100)
+        with self.lock:
+            poller = self.pollers.get(user_id)
+            if poller is None:
+                poller = _UserPoller(user_id, token_provider)
+                self.pollers[user_id] = poller
+            poller.token_provider = token_provider
+            poller.subscribers.add(listener)
+            
+            if poller.snapshot is not None:
+                listener.put(('snapshot', poller.snapshot))
+            if poller.thread is None:
+                poller.thread = threading.Thread(
+                    target=self._poll_loop, args=(poller,), name=f'playback-{user_id}', daemon=True
+                )
+                poller.thread.start()
+        return listener
+    
+    def unsubscribe(self, user_id, listener):
+        with self.lock:
+            poller = self.pollers.get(user_id)
+            if poller is not None:
+                poller.subscribers.discard(listener)
+                if not poller.subscribers:
+                    poller.wake.set()
+    
+    def refresh(self, user_id):
+        """Poll ``user_id`` right away, e.g. after a playback control action"""
+        with self.lock:
+            poller = self.pollers.get(user_id)
+            if poller is not None:
+                poller.wake.set()
+    
+    def _fetch_snapshot(self, poller):
+        access_token = poller.token_provider()
+        if not access_token:
+            return None
+        
+        spotify_client = SpotifyClient(access_token, user_id=poller.user_id)
+        self.upstream_polls += 1
+        return spotify_client.get_playback_snapshot()
+    
+    def _next_interval(self, snapshot):
+        playback_state = snapshot.get('playback_state') if snapshot else None
+        if not isinstance(playback_state, dict):
+            return PLAYBACK_POLL_IDLE
+        if playback_state.get('is_playing'):
+            return PLAYBACK_POLL_PLAYING
+        return PLAYBACK_POLL_PAUSED
+    
+    def _broadcast(self, poller, event, data):
+        with self.lock:
+            listeners = list(poller.subscribers)
+        for listener in listeners:
+            try:
+                listener.put_nowait((event, data))
+            except queue.Full:
+                # A stalled tab must not hold up the others; it resyncs on reconnect
+                logging.warning(f"Dropping playback update for a stalled listener of {poller.user_id}")
+    
+    def _poll_loop(self, poller):
+        logging.info(f"Playback poller started for {poller.user_id}")
+        try:
+            while True:
+                with self.lock:
+                    if not poller.subscribers:
+                        break
+                    poller.wake.clear()
+                
+                try:
+                    snapshot = self._fetch_snapshot(poller)
+                except Exception as e:
+                    logging.error(f"Playback poll failed for {poller.user_id}: {e}")
+                    snapshot = None
+                
+                if snapshot is None:
+                    self._broadcast(poller, 'error', {'message': 'Playback state unavailable'})
+                elif poller.snapshot is None:
+                    poller.snapshot = snapshot
+                    self._broadcast(poller, 'snapshot', snapshot)
+                else:
+                    changes = diff_snapshots(poller.snapshot, snapshot)
+                    poller.snapshot = snapshot
+                    if changes:
+                        self._broadcast(poller, 'diff', changes)
+                
+                poller.wake.wait(self._next_interval(poller.snapshot))
+        finally:
+            with self.lock:
+                poller.thread = None
+                if not poller.subscribers:
+                    self.pollers.pop(poller.user_id, None)
+                elif self.pollers.get(poller.user_id) is poller:
+                    # A tab subscribed while we were shutting down; keep serving it
+                    poller.thread = threading.Thread(
+                        target=self._poll_loop, args=(poller,), name=f'playback-{poller.user_id}', daemon=True
+                    )
+                    poller.thread.start()
+            logging.info(f"Playback poller stopped for {poller.user_id}")
+    
+    def has_stream_capacity(self):
+        """Whether another stream can open now; ``stream`` makes the binding check"""
+        with self.lock:
+            if self.open_streams < PLAYBACK_STREAM_MAX_CONCURRENT:
+                return True
+            self.rejected_streams += 1
+            return False
+    
+    def stream(self, user_id, token_provider):
+        """Yield Server-Sent Events for ``user_id`` until the client disconnects.
+        
+        When the worker already has PLAYBACK_STREAM_MAX_CONCURRENT streams open,
+        sends a single ``busy`` event instead so the tab falls back to polling.
+        """
+        with self.lock:
+            admitted = self.open_streams < PLAYBACK_STREAM_MAX_CONCURRENT
+            if admitted:
+                self.open_streams += 1
+            else:
+                self.rejected_streams += 1
+        if not admitted:
+            yield format_event('busy', {'retry_after': PLAYBACK_STREAM_MAX_AGE})
+            return
+        
+        try:
+            listener = self.subscribe(user_id, token_provider)
+            started_at = time.time()
+            try:
+                yield f"retry: {int(PLAYBACK_POLL_PLAYING * 1000)}\n\n"
+                while time.time() - started_at < PLAYBACK_STREAM_MAX_AGE:
+                    try:
+                        event, data = listener.get(timeout=PLAYBACK_STREAM_HEARTBEAT)
+                    except queue.Empty:
+                        # Writing is how a disconnected client is detected
+                        yield ": keep-alive\n\n"
+                        continue
+                    yield format_event(event, data)
+            finally:
+                self.unsubscribe(user_id, listener)
+        finally:
+            with self.lock:
+                self.open_streams -= 1
+    
+    def get_stats(self):
+        with self.lock:
+            return {
+                'active_users': len(self.pollers),
+                'listeners': sum(len(poller.subscribers) for poller in self.pollers.values()),
+                'upstream_polls': self.upstream_polls,
+                'open_streams': self.open_streams,
+                'max_streams': PLAYBACK_STREAM_MAX_CONCURRENT,
+                'rejected_streams': self.rejected_streams
+            }
+
+
+playback_broker = PlaybackBroker()
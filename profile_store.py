@@ -0,0 +1,67 @@
+import os
+import json
+import logging
+from datetime import datetime, timedelta
+
+from app import db
+from models import MusicTasteProfile
+
+# Profiles are regenerated after this many seconds (matches the old session cache)
+PROFILE_TTL = int(os.environ.get('PROFILE_TTL', 1800))
+# Profiles larger than this are not stored; a taste profile is a few hundred bytes
+PROFILE_MAX_BYTES = int(os.environ.get('PROFILE_MAX_BYTES', 64 * 1024))
+# Upper bound on stored profiles; the ones closest to expiry are pruned first
+PROFILE_MAX_ROWS = int(os.environ.get('PROFILE_MAX_ROWS', 10000))
+
+
+def get_profile(user_id):
+    """Return the cached music taste profile for a user, or None if missing or expired"""
+    entry = MusicTasteProfile.query.get(user_id)
+    if not entry:
+        return None
+    if entry.expires_at <= datetime.utcnow():
+        return None
+    try:
+        return json.loads(entry.profile_json)
+    except ValueError:
+        logging.warning(f"Discarding unreadable music taste profile for {user_id}")
+        return None
+
+
+def save_profile(user_id, profile, ttl=PROFILE_TTL):
+    """Store a user's music taste profile so every worker can serve it"""
+    profile_json = json.dumps(profile)
+    if len(profile_json) > PROFILE_MAX_BYTES:
+        logging.warning(f"Music taste profile for {user_id} is {len(profile_json)} bytes, not caching")
+        return False
+    
+    now = datetime.utcnow()
+    entry = MusicTasteProfile.query.get(user_id) or MusicTasteProfile(user_id=user_id)
+    entry.profile_json = profile_json
+    entry.created_at = now
+    entry.expires_at = now + timedelta(seconds=ttl)
+    db.session.add(entry)
+    db.session.commit()
+    
+    prune_profiles()
+    return True
+
+
+def delete_profile(user_id):
+    MusicTasteProfile.query.filter_by(user_id=user_id).delete()
+    db.session.commit()
+
+
+def prune_profiles():
+    """Delete expired profiles and enforce the row cap"""
+    MusicTasteProfile.query.filter(MusicTasteProfile.expires_at <= datetime.utcnow()).delete()
+    
+    overflow = MusicTasteProfile.query.count() - PROFILE_MAX_ROWS
+    if overflow > 0:
+        oldest = db.session.query(MusicTasteProfile.user_id)\
+                           .order_by(MusicTasteProfile.expires_at)\
+                           .limit(overflow)\
+                           .subquery()
+        MusicTasteProfile.query.filter(MusicTasteProfile.user_id.in_(db.select(oldest.c.user_id)))\
+                               .delete(synchronize_session=False)
+    db.session.commit()
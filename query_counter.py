@@ -0,0 +1,53 @@
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """Records the SQL statements an engine executes on the current thread"""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(engine):
+    """Count statements executed on ``engine`` by this thread inside the block.
+
+    Usage::
+
+        with count_queries(db.engine) as counter:
+            feedback_store.recent_feedback_with_tracks(user_id)
+        print(counter.count, counter.statements)
+    """
+    counter = QueryCounter()
+    thread_id = threading.get_ident()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == thread_id:
+            counter.statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+@contextmanager
+def assert_max_queries(engine, expected):
+    """Fail with the offending statements if the block runs more than ``expected`` queries.
+
+    Guards data-access paths against N+1 regressions: a loop that issues one
+    query per row shows up as a count that grows with the data.
+    """
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > expected:
+        statements = '\n'.join(f'  {statement}' for statement in counter.statements)
+        raise AssertionError(f"Expected at most {expected} queries, ran {counter.count}:\n{statements}")
@@ -0,0 +1,130 @@
+import os
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+
+# Worker-wide Spotify request budget. Spotify rate limits the whole app
+# credential, so every SpotifyClient in the process draws from one bucket.
+SPOTIFY_RATE_LIMIT_PER_SEC = float(os.environ.get('SPOTIFY_RATE_LIMIT_PER_SEC', 10))
+SPOTIFY_RATE_LIMIT_BURST = int(os.environ.get('SPOTIFY_RATE_LIMIT_BURST', 20))
+
+# Per-request retry budget: maximum retries and total seconds spent waiting
+SPOTIFY_MAX_RETRIES = int(os.environ.get('SPOTIFY_MAX_RETRIES', 3))
+SPOTIFY_RETRY_BUDGET = float(os.environ.get('SPOTIFY_RETRY_BUDGET', 10.0))
+SPOTIFY_BACKOFF_BASE = 0.5
+SPOTIFY_BACKOFF_CAP = 8.0
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'}
+
+
+class TokenBucket:
+    """Thread-safe token bucket with reservations.
+    
+    reserve() never blocks: it takes a token (possibly going into debt) and
+    returns how long the caller must wait before using it.
+    """
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+        self.throttled = 0
+        self.pauses = 0
+        self.refused = 0
+    
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+    
+    def reserve(self, max_wait=None):
+        """Take one token and return the number of seconds to wait before using it.
+        
+        If the wait would exceed ``max_wait``, returns None without taking a
+        token: a caller that gives up must not push everyone else further
+        into debt.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            tokens = self.tokens - 1
+            delay = 0.0 if tokens >= 0 else -tokens / self.rate
+            delay = max(delay, self.paused_until - now)
+            if max_wait is not None and delay > max_wait:
+                self.refused += 1
+                return None
+            self.tokens = tokens
+            if delay > 0:
+                self.throttled += 1
+            return delay
+    
+    def pause(self, seconds):
+        """Stop handing out immediate tokens for ``seconds`` (e.g. after a 429)"""
+        with self.lock:
+            until = time.monotonic() + seconds
+            if until > self.paused_until:
+                self.paused_until = until
+                self.pauses += 1
+    
+    def get_stats(self):
+        with self.lock:
+            self._refill(time.monotonic())
+            return {
+                'rate_per_sec': self.rate,
+                'capacity': self.capacity,
+                'available_tokens': round(max(self.tokens, 0), 2),
+                'throttled_requests': self.throttled,
+                'refused_requests': self.refused,
+                'retry_after_pauses': self.pauses,
+                'paused_for': round(max(self.paused_until - time.monotonic(), 0), 2)
+            }
+
+
+spotify_rate_limiter = TokenBucket(SPOTIFY_RATE_LIMIT_PER_SEC, SPOTIFY_RATE_LIMIT_BURST)
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for the given retry attempt (0-based)"""
+    return random.uniform(0, min(SPOTIFY_BACKOFF_CAP, SPOTIFY_BACKOFF_BASE * (2 ** attempt)))
+
+
+def retry_delay(method, status_code, retry_after, attempt):
+    """Return how long to wait before retrying a failed call, or None to give up.
+    
+    429s are always safe to retry because Spotify did not process the call;
+    5xx responses and network errors (status_code None) are only retried for
+    idempotent methods so a POST is never applied twice.
+    """
+    if attempt >= SPOTIFY_MAX_RETRIES:
+        return None
+    if status_code == 429:
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            delay = backoff_delay(attempt)
+        # Everyone on this worker shares the credential, so everyone backs off
+        spotify_rate_limiter.pause(delay)
+        return delay
+    if method.upper() not in IDEMPOTENT_METHODS:
+        return None
+    if status_code is None or status_code in RETRYABLE_STATUS_CODES:
+        return backoff_delay(attempt)
+    return None
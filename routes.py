@@ -3,16 +3,28 @@ import secrets
 import base64
 import json
 import time
+import threading
 from datetime import datetime, timedelta
-from flask import render_template, request, redirect, url_for, session, flash, jsonify
+from itertools import chain
+from collections import Counter
+from flask import render_template, request, redirect, url_for, session, flash, jsonify, Response
 from urllib.parse import urlencode
 import requests
 from app import app, db
 from models import User, UserFeedback, Recommendation
-from spotify_client import SpotifyClient
-import google.generativeai as genai
+from spotify_client import SpotifyClient, get_pool_stats, fetch_concurrently, response_cache, search_cache, request_coalescer
+from rate_limiter import spotify_rate_limiter
+from ttl_cache import TTLCache, MISSING
+from playback_stream import playback_broker
+import profile_store
+import feedback_store
+import catalog
+from track_parser import parse_recommendation, PARSE_CONFIDENCE_THRESHOLD
+import gemini_client
+from google.api_core import exceptions as google_exceptions
 import logging
-from structured_llm import structured_llm
+from track_matcher import select_spotify_result
+from track_resolver import iter_resolved_tracks
 
 # Get logger
 logger = logging.getLogger(__name__)
@@ -36,6 +48,9 @@ def log_llm_timing(operation_name):
         return wrapper
     return decorator
 
+# Seconds the playlist LLM call may take before the request gives up
+AI_PLAYLIST_TIMEOUT = 30
+
 # Spotify OAuth configuration
 SPOTIFY_CLIENT_ID = os.environ.get('SPOTIFY_CLIENT_ID', '3eab9e9e7ff444e8b0a9d1c18468b555')
 SPOTIFY_CLIENT_SECRET = os.environ.get('SPOTIFY_CLIENT_SECRET')
@@ -253,15 +268,69 @@ def callback():
         flash('An unexpected error occurred. Please try again.', 'error')
         return redirect(url_for('index'))
 
+# Saved-library scan for taste analysis. It runs in the background and its
+# summary is cached for a day, so it never adds to the insights fan-out
+LIBRARY_SCAN_MAX_ITEMS = int(os.environ.get('LIBRARY_SCAN_MAX_ITEMS', 2000))
+LIBRARY_SCAN_TIME_BUDGET = float(os.environ.get('LIBRARY_SCAN_TIME_BUDGET', 4.0))
+LIBRARY_SUMMARY_TTL = int(os.environ.get('LIBRARY_SUMMARY_TTL', 24 * 3600))
+EMPTY_LIBRARY_SUMMARY = {'tracks_scanned': 0, 'top_artists': []}
+library_summary_cache = TTLCache(1024 * 1024, default_ttl=LIBRARY_SUMMARY_TTL, name='library_summaries')
+_library_scans = set()
+_library_scans_lock = threading.Lock()
+
+def summarize_saved_library(spotify_client):
+    """Count artists across the user's saved library without holding it in memory"""
+    artist_counts = Counter()
+    scanned = 0
+    for item in spotify_client.iter_saved_tracks(max_items=LIBRARY_SCAN_MAX_ITEMS, time_budget=LIBRARY_SCAN_TIME_BUDGET):
+        artists = (item.get('track') or {}).get('artists') or []
+        if artists:
+            artist_counts[artists[0].get('name')] += 1
+        scanned += 1
+    return {
+        'tracks_scanned': scanned,
+        'top_artists': [name for name, _count in artist_counts.most_common(10)]
+    }
+
+def get_library_summary(spotify_client, user_id):
+    """Return the cached saved-library summary, starting a background scan on a miss.
+    
+    Never waits on Spotify: until the first scan for a user finishes, the
+    summary is empty. The scan runs on its own thread rather than the
+    fan-out pool, so page prefetching stays on.
+    """
+    summary = library_summary_cache.get(user_id)
+    if summary is not MISSING:
+        return summary
+    
+    with _library_scans_lock:
+        if user_id in _library_scans:
+            return EMPTY_LIBRARY_SUMMARY
+        _library_scans.add(user_id)
+    
+    def scan():
+        try:
+            library_summary_cache.set(user_id, summarize_saved_library(spotify_client))
+        except Exception as e:
+            app.logger.error(f"Saved library scan failed for {user_id}: {e}")
+        finally:
+            with _library_scans_lock:
+                _library_scans.discard(user_id)
+    
+    threading.Thread(target=scan, name=f'library-scan-{user_id}', daemon=True).start()
+    return EMPTY_LIBRARY_SUMMARY
+
 def generate_music_taste_insights(spotify_client, gemini_api_key=None):
     """Generate music taste insights from user's Spotify data using AI analysis"""
     
-    # Check if we already have cached insights for this session
-    if 'music_taste_profile' in session and 'profile_timestamp' in session:
-        # Cache for 30 minutes per session to avoid redundant AI calls
-        if time.time() - session['profile_timestamp'] < 1800:
+    # Check if we already have cached insights for this user - the profile is
+    # stored server-side so any worker can serve it without a new AI call
+    user_id = session.get('user_id')
+    if user_id:
+        cached_profile = profile_store.get_profile(user_id)
+        if cached_profile:
             app.logger.info("Using cached music taste profile")
-            return session['music_taste_profile']
+            return cached_profile
     
     try:
         # Only proceed with AI analysis if API key is provided
@@ -269,12 +338,26 @@ def generate_music_taste_insights(spotify_client, gemini_api_key=None):
             # Return basic stats without AI analysis
             return generate_basic_insights(spotify_client)
         
-        # Get comprehensive music data
-        recent_tracks = spotify_client.get_recently_played(limit=30) or {'items': []}
-        top_artists_short = spotify_client.get_top_artists(time_range='short_term', limit=15) or {'items': []}
-        top_artists_medium = spotify_client.get_top_artists(time_range='medium_term', limit=15) or {'items': []}
-        top_tracks_short = spotify_client.get_top_tracks(time_range='short_term', limit=15) or {'items': []}
-        top_tracks_medium = spotify_client.get_top_tracks(time_range='medium_term', limit=15) or {'items': []}
+        # Get comprehensive music data - the five fetches are independent, so run
+        # them concurrently; any call that fails or misses the deadline is empty
+        fetched = fetch_concurrently({
+            'recent_tracks': lambda: spotify_client.get_recently_played(limit=30),
+            'top_artists_short': lambda: spotify_client.get_top_artists(time_range='short_term', limit=15),
+            'top_artists_medium': lambda: spotify_client.get_top_artists(time_range='medium_term', limit=15),
+            'top_tracks_short': lambda: spotify_client.get_top_tracks(time_range='short_term', limit=15),
+            'top_tracks_medium': lambda: spotify_client.get_top_tracks(time_range='medium_term', limit=15)
+        })
+        recent_tracks = fetched['recent_tracks'] or {'items': []}
+        top_artists_short = fetched['top_artists_short'] or {'items': []}
+        top_artists_medium = fetched['top_artists_medium'] or {'items': []}
+        top_tracks_short = fetched['top_tracks_short'] or {'items': []}
+        top_tracks_medium = fetched['top_tracks_medium'] or {'items': []}
+        
+        # Artists embedded in tracks carry no genres; look them all up in one batched call
+        recent_items = [item for item in recent_tracks.get('items', [])[:20] if item['track']['artists']]
+        recent_artists = spotify_client.get_several_artists(
+            item['track']['artists'][0]['id'] for item in recent_items
+        )
         
         # Prepare data for AI analysis
         music_data = {
@@ -282,9 +365,9 @@ def generate_music_taste_insights(spotify_client, gemini_api_key=None):
                 {
                     'name': item['track']['name'],
                     'artist': item['track']['artists'][0]['name'],
-                    'genres': item['track']['artists'][0].get('genres', []) if len(item['track']['artists']) > 0 else []
+                    'genres': recent_artists.get(item['track']['artists'][0]['id'], {}).get('genres', [])
                 }
-                for item in recent_tracks.get('items', [])[:20]
+                for item in recent_items
             ],
             'top_artists_recent': [
                 {
@@ -317,17 +400,18 @@ def generate_music_taste_insights(spotify_client, gemini_api_key=None):
                     'popularity': track.get('popularity', 0)
                 }
                 for track in top_tracks_medium.get('items', [])[:10]
-            ]
+            ],
+            'saved_library': get_library_summary(spotify_client, user_id) if user_id else EMPTY_LIBRARY_SUMMARY
         }
         
         # Generate AI insights
         ai_insights = generate_ai_music_analysis(music_data, gemini_api_key)
         
         if ai_insights:
-            # Cache the result in session for 30 minutes
-            session['music_taste_profile'] = ai_insights
-            session['profile_timestamp'] = time.time()
-            app.logger.info("Cached new music taste profile")
+            # Cache the result server-side for 30 minutes
+            if user_id:
+                profile_store.save_profile(user_id, ai_insights)
+                app.logger.info("Cached new music taste profile")
             return ai_insights
         else:
             # Fallback to basic insights if AI fails
@@ -341,8 +425,12 @@ def generate_basic_insights(spotify_client):
     """Generate basic insights without AI analysis"""
     try:
         # Get basic music data
-        recent_tracks = spotify_client.get_recently_played(limit=20) or {'items': []}
-        top_artists_short = spotify_client.get_top_artists(time_range='short_term', limit=10) or {'items': []}
+        fetched = fetch_concurrently({
+            'recent_tracks': lambda: spotify_client.get_recently_played(limit=20),
+            'top_artists_short': lambda: spotify_client.get_top_artists(time_range='short_term', limit=10)
+        })
+        recent_tracks = fetched['recent_tracks'] or {'items': []}
+        top_artists_short = fetched['top_artists_short'] or {'items': []}
         
         # Extract basic stats
         recent_track_count = len(recent_tracks.get('items', []))
@@ -401,10 +489,7 @@ def generate_basic_insights(spotify_client):
 def generate_ai_music_analysis(music_data, gemini_api_key):
     """Use Gemini AI to generate detailed music taste insights"""
     try:
-        import google.generativeai as genai
-        
-        genai.configure(api_key=gemini_api_key)
-        model = genai.GenerativeModel('gemini-2.5-flash-preview-05-20')
+        model = gemini_client.get_model(gemini_api_key, 'gemini-2.5-flash-preview-05-20')
         
         # Create insightful, data-driven prompt for music analysis
         prompt = f"""
@@ -478,13 +563,12 @@ def dashboard():
             flash('Session expired. Please log in again.', 'error')
             return redirect(url_for('logout'))
     
-    spotify_client = SpotifyClient(user.access_token)
+    spotify_client = SpotifyClient(user.access_token, user_id=user.id)
     
-    # Get currently playing track
-    current_track = spotify_client.get_current_track()
-    
-    # Get playback state
-    playback_state = spotify_client.get_playback_state()
+    # Get currently playing track and playback state in one upstream call
+    playback = spotify_client.get_playback_snapshot()
+    current_track = playback['current_track']
+    playback_state = playback['playback_state']
     
     # Generate basic music insights without API key (AI analysis happens client-side)
     music_insights = generate_music_taste_insights(spotify_client)
@@ -509,8 +593,10 @@ def play():
             return jsonify({'error': 'User not found'}), 404
         return redirect(url_for('index'))
     
-    spotify_client = SpotifyClient(user.access_token)
+    spotify_client = SpotifyClient(user.access_token, user_id=user.id)
     success = spotify_client.play()
+    if success:
+        playback_broker.refresh(user.id)
     
     if request.method == 'POST':
         return jsonify({'success': success})
@@ -536,8 +622,10 @@ def pause():
             return jsonify({'error': 'User not found'}), 404
         return redirect(url_for('index'))
     
-    spotify_client = SpotifyClient(user.access_token)
+    spotify_client = SpotifyClient(user.access_token, user_id=user.id)
     success = spotify_client.pause()
+    if success:
+        playback_broker.refresh(user.id)
     
     if request.method == 'POST':
         return jsonify({'success': success})
@@ -565,7 +653,7 @@ def play_recommendation():
     if not track_uri:
         return jsonify({'success': False, 'message': 'Track URI required'}), 400
     
-    spotify_client = SpotifyClient(user.access_token)
+    spotify_client = SpotifyClient(user.access_token, user_id=user.id)
     
     # Check for available devices first
     devices = spotify_client.get_devices()
@@ -578,6 +666,7 @@ def play_recommendation():
     success = spotify_client.play_track(track_uri)
     
     if success:
+        playback_broker.refresh(user.id)
         return jsonify({'success': True, 'message': 'Playing recommended track'})
     else:
         return jsonify({
@@ -617,8 +706,7 @@ def chat_feedback():
             return jsonify({'success': False, 'message': 'AI analysis not available - API key required'}), 400
         
         # Configure Gemini for feedback analysis - USE FASTER MODEL
-        genai.configure(api_key=custom_gemini_key)
-        model = genai.GenerativeModel('gemini-1.5-flash')  # Much faster than 2.5-flash-preview
+        model = gemini_client.get_model(custom_gemini_key, 'gemini-1.5-flash')  # Much faster than 2.5-flash-preview
         
         # Create SIMPLIFIED prompt for analyzing user feedback (reduced complexity)
         feedback_analysis_prompt = f"""Analyze this music feedback quickly:
@@ -747,36 +835,31 @@ def get_track_reasoning(recommendation_id):
         app.logger.error(f'Error getting track reasoning for ID {recommendation_id}: {str(e)}', exc_info=True)
         return jsonify({'error': 'Failed to get track reasoning'}), 500
 
-def process_feedback_insights(feedbacks, gemini_api_key=None):
+def process_feedback_insights(user_id, sentiment_counts, gemini_api_key=None):
     """Process user feedback entries to generate AI-powered conversational insights"""
-    if not feedbacks:
+    if not sentiment_counts['total']:
         return "No feedback available yet. Start rating songs to get personalized insights!"
     
     # If no API key, fall back to basic insights
     if not gemini_api_key:
-        return generate_basic_feedback_insights(feedbacks)
+        return generate_basic_feedback_insights(sentiment_counts)
     
     try:
         # Prepare feedback data for AI analysis
-        feedback_data = []
-        for feedback in feedbacks[:10]:  # Limit to recent 10 feedback entries
-            # Get the recommendation details
-            from models import Recommendation
-            recommendation = Recommendation.query.get(feedback.recommendation_id)
-            if recommendation:
-                feedback_entry = {
-                    'track_name': recommendation.track_name,
-                    'artist_name': recommendation.artist_name,
-                    'feedback_text': feedback.feedback_text,
-                    'sentiment': feedback.sentiment,
-                    'created_at': feedback.created_at.isoformat() if feedback.created_at else None
-                }
-                feedback_data.append(feedback_entry)
+        # Limit to the newest 10 feedback entries, loaded with their tracks in a single query
+        feedback_data = [
+            {
+                'track_name': row.track_name,
+                'artist_name': row.artist_name,
+                'feedback_text': row.feedback_text,
+                'sentiment': row.sentiment,
+                'created_at': row.created_at.isoformat() if row.created_at else None
+            }
+            for row in feedback_store.recent_feedback_with_tracks(user_id, limit=10)
+        ]
         
         # Generate AI insights using Gemini
-        import google.generativeai as genai
-        genai.configure(api_key=gemini_api_key)
-        model = genai.GenerativeModel('gemini-1.5-flash')  # Fast model for quick insights
+        model = gemini_client.get_model(gemini_api_key, 'gemini-1.5-flash')  # Fast model for quick insights
         
         # Create conversational prompt for feedback analysis
         prompt = f"""
@@ -808,18 +891,18 @@ Respond with ONLY the conversational insight text, no other formatting or labels
             return ai_insights
         else:
             app.logger.warning("AI feedback analysis failed, using fallback")
-            return generate_basic_feedback_insights(feedbacks)
+            return generate_basic_feedback_insights(sentiment_counts)
             
     except Exception as e:
         app.logger.error(f"Error generating AI feedback insights: {e}")
-        return generate_basic_feedback_insights(feedbacks)
+        return generate_basic_feedback_insights(sentiment_counts)
 
-def generate_basic_feedback_insights(feedbacks):
+def generate_basic_feedback_insights(sentiment_counts):
     """Generate basic feedback insights when AI is not available"""
-    # Count sentiments
-    positive_count = sum(1 for f in feedbacks if f.sentiment and 'positive' in f.sentiment.lower())
-    negative_count = sum(1 for f in feedbacks if f.sentiment and 'negative' in f.sentiment.lower())
-    total_feedback = len(feedbacks)
+    # Sentiment counts come from a SQL aggregate (feedback_store.sentiment_counts)
+    positive_count = sentiment_counts['positive']
+    negative_count = sentiment_counts['negative']
+    total_feedback = sentiment_counts['total']
     
     # Create insights summary
     if positive_count > negative_count:
@@ -844,10 +927,11 @@ def get_feedback_insights():
             logger.warning('No user_id in session')
             return jsonify({'error': 'Not authenticated'}), 401
 
-        feedbacks = UserFeedback.query.filter_by(user_id=user_id).all()
-        logger.debug(f'Found {len(feedbacks)} feedback entries for user {user_id}')
+        # Counts are aggregated in SQL; feedback rows are only loaded (newest 10) for the AI prompt
+        sentiment_counts = feedback_store.sentiment_counts(user_id)
+        logger.debug(f"Found {sentiment_counts['total']} feedback entries for user {user_id}")
 
-        if not feedbacks:
+        if not sentiment_counts['total']:
             logger.info('No feedback found for user')
             return jsonify({'insights': None})
 
@@ -858,7 +942,7 @@ def get_feedback_insights():
             gemini_api_key = request_data.get('custom_gemini_key')
 
         # Process feedback for insights (with or without AI)
-        insights = process_feedback_insights(feedbacks, gemini_api_key)
+        insights = process_feedback_insights(user_id, sentiment_counts, gemini_api_key)
         logger.debug('Successfully generated feedback insights')
         return jsonify({'insights': insights, 'ai_powered': bool(gemini_api_key)})
 
@@ -881,15 +965,44 @@ def api_current_track():
         if not refresh_user_token(user):
             return jsonify({'error': 'Token expired'}), 401
     
-    spotify_client = SpotifyClient(user.access_token)
+    spotify_client = SpotifyClient(user.access_token, user_id=user.id)
+    
+    return jsonify(spotify_client.get_playback_snapshot())
+
+def make_token_provider(user_id):
+    """Build a callable that returns a fresh access token for background pollers"""
+    def token_provider():
+        with app.app_context():
+            user = User.query.get(user_id)
+            if not user:
+                return None
+            if user.is_token_expired() and not refresh_user_token(user):
+                return None
+            return user.access_token
+    return token_provider
+
+@app.route('/api/current-track/stream')
+def api_current_track_stream():
+    """Server-Sent Events stream of playback changes, shared by all of the user's tabs"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    user = User.query.get(session['user_id'])
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
     
-    current_track = spotify_client.get_current_track()
-    playback_state = spotify_client.get_playback_state()
+    # Each open stream holds a server thread; past the cap the tab polls instead
+    if not playback_broker.has_stream_capacity():
+        return jsonify({'error': 'Too many open playback streams'}), 503, {'Retry-After': '60'}
     
-    return jsonify({
-        'current_track': current_track,
-        'playback_state': playback_state
-    })
+    return Response(
+        playback_broker.stream(user.id, make_token_provider(user.id)),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
 
 @app.route('/create-ai-playlist', methods=['POST'])
 def create_ai_playlist():
@@ -897,7 +1010,7 @@ def create_ai_playlist():
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Not authenticated'}), 401
     
-    from models import Recommendation, UserFeedback
+    from models import Recommendation
     
     user = User.query.get(session['user_id'])
     if not user:
@@ -917,12 +1030,10 @@ def create_ai_playlist():
                 'message': 'Personal Gemini API key required. Please add your API key in AI Settings to create playlists.'
             })
         
-        spotify_client = SpotifyClient(user.access_token)
+        spotify_client = SpotifyClient(user.access_token, user_id=user.id)
         
         # Generate AI-powered track recommendations for the playlist
-        import google.generativeai as genai
-        genai.configure(api_key=custom_gemini_key)
-        model = genai.GenerativeModel('gemini-2.5-flash-preview-05-20')
+        model = gemini_client.get_model(custom_gemini_key, 'gemini-2.5-flash-preview-05-20')
         
         # Get optimized user data for context - reduce API calls for stability
         app.logger.info("Collecting optimized user music data for AI playlist creation...")
@@ -944,16 +1055,13 @@ def create_ai_playlist():
         # Get simplified user feedback insights - limit to prevent memory issues
         feedback_insights = ""
         try:
-            feedback_entries = UserFeedback.query.filter_by(user_id=user.id).order_by(UserFeedback.created_at.desc()).limit(5).all()
-            if feedback_entries:
-                feedback_summary = []
-                for feedback in feedback_entries[:3]:  # Only use top 3 to reduce load
-                    rec = Recommendation.query.get(feedback.recommendation_id)
-                    if rec:
-                        feedback_summary.append(f"User {feedback.sentiment or 'neutral'} feedback on {rec.track_name} by {rec.artist_name}")
-                
-                if feedback_summary:
-                    feedback_insights = f"RECENT FEEDBACK: {'; '.join(feedback_summary)}\n\n"
+            # Only use the latest 3 to keep the prompt small
+            feedback_summary = [
+                f"User {row.sentiment or 'neutral'} feedback on {row.track_name} by {row.artist_name}"
+                for row in feedback_store.recent_feedback_with_tracks(user.id, limit=3)
+            ]
+            if feedback_summary:
+                feedback_insights = f"RECENT FEEDBACK: {'; '.join(feedback_summary)}\n\n"
         except Exception as e:
             app.logger.warning(f"Could not load feedback insights: {e}")
             pass
@@ -987,22 +1095,13 @@ Please respond with ONLY the song list, one song per line, in this exact format:
 
 Do not include any other text, explanations, or formatting."""
 
-        # Generate AI recommendations with timeout protection
+        # Generate AI recommendations with timeout protection. The timeout is
+        # enforced by the client's request, which works on any worker thread
         try:
-            import signal
-            
-            def timeout_handler(signum, frame):
-                raise TimeoutError("AI generation timed out")
-            
-            signal.signal(signal.SIGALRM, timeout_handler)
-            signal.alarm(30)  # 30 second timeout
-            
-            response = model.generate_content(prompt)
+            response = model.generate_content(prompt, request_options={'timeout': AI_PLAYLIST_TIMEOUT})
             ai_recommendations = response.text.strip()
             
-            signal.alarm(0)  # Cancel timeout
-            
-        except TimeoutError:
+        except (TimeoutError, google_exceptions.DeadlineExceeded):
             app.logger.error("AI generation timed out")
             return jsonify({
                 'success': False,
@@ -1019,50 +1118,14 @@ Do not include any other text, explanations, or formatting."""
         track_lines = [line.strip() for line in ai_recommendations.split('\n') if line.strip()]
         track_uris = []
         successful_tracks = []
-        failed_count = 0
         
         app.logger.info(f"AI recommended {len(track_lines)} tracks for playlist")
         
-        # Search for each recommended track on Spotify with limits
-        for i, track_line in enumerate(track_lines[:song_count + 3]):  # Get a few extra in case some fail
-            if len(track_uris) >= song_count:  # Stop when we have enough
-                break
-                
-            try:
-                # Parse "Song Title" by Artist Name format
-                if '" by ' in track_line:
-                    parts = track_line.split('" by ')
-                    if len(parts) == 2:
-                        song_title = parts[0].replace('"', '').strip()
-                        artist_name = parts[1].strip()
-                        
-                        # Search for the track with retry logic
-                        search_query = f'track:"{song_title}" artist:"{artist_name}"'
-                        search_results = spotify_client.search_tracks(search_query, limit=1)
-                        
-                        if search_results and search_results.get('tracks', {}).get('items'):
-                            track = search_results['tracks']['items'][0]
-                            track_uris.append(track['uri'])
-                            successful_tracks.append(f"{track['name']} by {track['artists'][0]['name']}")
-                            app.logger.info(f"Found track: {track['name']} by {track['artists'][0]['name']}")
-                        else:
-                            failed_count += 1
-                            app.logger.warning(f"Could not find track: {song_title} by {artist_name}")
-                            
-                            # If too many failures, try broader search
-                            if failed_count > 2:
-                                broad_search = spotify_client.search_tracks(f"{song_title} {artist_name}", limit=1)
-                                if broad_search and broad_search.get('tracks', {}).get('items'):
-                                    track = broad_search['tracks']['items'][0]
-                                    track_uris.append(track['uri'])
-                                    successful_tracks.append(f"{track['name']} by {track['artists'][0]['name']}")
-                                    
-            except Exception as e:
-                app.logger.error(f"Error processing track line '{track_line}': {e}")
-                failed_count += 1
-                continue
+        # Search for the recommended tracks concurrently; extra lines cover ones that fail
+        resolved_tracks = iter_resolved_tracks(spotify_client, track_lines[:song_count + 3], limit=song_count)
+        first_track = next(resolved_tracks, None)
         
-        if not track_uris:
+        if not first_track:
             return jsonify({
                 'success': False,
                 'message': 'Could not find any of the AI-recommended tracks on Spotify'
@@ -1072,6 +1135,7 @@ Do not include any other text, explanations, or formatting."""
         playlist_result = spotify_client.create_playlist(playlist_name, playlist_description)
         
         if not playlist_result:
+            resolved_tracks.close()
             return jsonify({
                 'success': False,
                 'message': 'Failed to create playlist on Spotify'
@@ -1079,18 +1143,24 @@ Do not include any other text, explanations, or formatting."""
         
         playlist_id = playlist_result['id']
         
-        # Add tracks to the playlist
-        if track_uris:
-            add_result = spotify_client.add_tracks_to_playlist(playlist_id, track_uris)
-            if not add_result:
-                app.logger.warning("Failed to add some tracks to playlist")
+        def found_track_uris():
+            for track in chain([first_track], resolved_tracks):
+                track_uris.append(track['uri'])
+                successful_tracks.append(f"{track['name']} by {track['artists'][0]['name']}")
+                app.logger.info(f"Found track: {track['name']} by {track['artists'][0]['name']}")
+                yield track['uri']
+        
+        # Tracks are written in chunks while the rest are still being resolved
+        add_result = spotify_client.add_tracks_to_playlist(playlist_id, found_track_uris())
+        if not add_result or add_result['tracks_failed']:
+            app.logger.warning("Failed to add some tracks to playlist")
         
         return jsonify({
             'success': True,
             'playlist_name': playlist_name,
             'playlist_id': playlist_id,
             'playlist_url': playlist_result['external_urls']['spotify'],
-            'tracks_added': len(track_uris),
+            'tracks_added': add_result['tracks_added'] if add_result else 0,
             'tracks_found': successful_tracks,
             'total_requested': song_count
         })
@@ -1105,11 +1175,11 @@ Do not include any other text, explanations, or formatting."""
 @app.route('/logout')
 def logout():
     """Log out user"""
-    session.pop('user_id', None)
+    user_id = session.pop('user_id', None)
     session.pop('oauth_state', None)
     # Clear any cached music insights to ensure no data persists
-    session.pop('music_taste_profile', None)
-    session.pop('profile_timestamp', None)
+    if user_id:
+        profile_store.delete_profile(user_id)
     session.pop('current_recommendation_id', None)
     session.pop('last_recommendation_time', None)
     flash('You have been logged out', 'info')
@@ -1217,6 +1287,14 @@ def get_performance_stats():
                     'cache_status': {'cached_entries': 0},
                     'total_recommendations': 0,
                     'current_mode': 'Lightning (hyper fast)',
+                    'spotify_pool': get_pool_stats(),
+                    'spotify_rate_limit': spotify_rate_limiter.get_stats(),
+                    'spotify_cache': response_cache.get_stats(),
+                    'spotify_search_cache': search_cache.get_stats(),
+                    'spotify_coalescing': request_coalescer.get_stats(),
+                    'playback_stream': playback_broker.get_stats(),
+                    'catalog': catalog.catalog.get_stats(),
+                    'library_summaries': library_summary_cache.get_stats(),
                     'note': 'Lightning mode optimization not available'
                 }
             })
@@ -1233,6 +1311,14 @@ def get_performance_stats():
                 'cache_status': cache_stats,
                 'total_recommendations': total_recommendations,
                 'current_mode': 'Lightning (hyper fast)',
+                'spotify_pool': get_pool_stats(),
+                'spotify_rate_limit': spotify_rate_limiter.get_stats(),
+                'spotify_cache': response_cache.get_stats(),
+                'spotify_search_cache': search_cache.get_stats(),
+                'spotify_coalescing': request_coalescer.get_stats(),
+                'playback_stream': playback_broker.get_stats(),
+                'catalog': catalog.catalog.get_stats(),
+                'library_summaries': library_summary_cache.get_stats(),
                 'optimization_available': True
             }
         })
@@ -1244,7 +1330,7 @@ def generate_conversational_reasoning(recommended_track, user_profile, music_dat
     """Generate conversational AI reasoning using the most advanced model"""
     try:
         # Use the most advanced model available
-        model = genai.GenerativeModel('gemini-2.5-flash-preview-05-20')
+        model = gemini_client.get_model(gemini_api_key, 'gemini-2.5-flash-preview-05-20')
         
         # Create a more varied and genuine conversational prompt
         prompt = f"""
@@ -1321,9 +1407,6 @@ def generate_conversational_reasoning_api():
     if not recommendation_id:
         return jsonify({'success': False, 'message': 'Recommendation ID required'}), 400
 
-    # Configure genai
-    genai.configure(api_key=gemini_api_key)
-
     try:
         # Get the recommendation from the database
         recommendation = Recommendation.query.get(recommendation_id)
@@ -1331,7 +1414,7 @@ def generate_conversational_reasoning_api():
             return jsonify({'success': False, 'message': 'Recommendation not found'}), 404
 
         # Get user's music data (use cached if available)
-        spotify_client = SpotifyClient(user.access_token)
+        spotify_client = SpotifyClient(user.access_token, user_id=user.id)
         cached_music_data = cache_manager.get_cached_data(user.id, 'music_data')
         
         if cached_music_data:
@@ -1390,9 +1473,6 @@ def ai_recommendation_lightning():
     if not gemini_api_key:
         return jsonify({'success': False, 'message': 'Gemini API key required'}), 400
 
-    # Configure genai
-    genai.configure(api_key=gemini_api_key)
-
     try:
         total_start_time = time.time()
         current_time = time.time()
@@ -1406,7 +1486,7 @@ def ai_recommendation_lightning():
             }), 429
 
         # Initialize Spotify client
-        spotify_client = SpotifyClient(user.access_token)
+        spotify_client = SpotifyClient(user.access_token, user_id=user.id)
         
         # Use hyper-optimized data collection with caching
         app.logger.info("LIGHTNING: Starting hyper-optimized data collection...")
@@ -1414,17 +1494,22 @@ def ai_recommendation_lightning():
         
         # Check for cached music data
         cached_music_data = cache_manager.get_cached_data(user.id, 'music_data')
+        collection_timings = {}
         
         if cached_music_data:
             app.logger.info("LIGHTNING: Using cached music data")
             music_data = cached_music_data
         else:
             app.logger.info("LIGHTNING: Collecting fresh music data")
-            music_data = data_optimizer.collect_optimized_spotify_data(spotify_client)
+            music_data = data_optimizer.collect_optimized_spotify_data(spotify_client, timings=collection_timings)
             cache_manager.cache_data(user.id, 'music_data', music_data)
         
         data_collection_duration = time.time() - data_collection_start
         app.logger.info(f"LIGHTNING: Data collection complete - {data_collection_duration:.2f}s")
+        if collection_timings:
+            app.logger.info(f"LIGHTNING: Spotify calls - {collection_timings['calls']}")
+            if collection_timings['missing_views']:
+                app.logger.warning(f"LIGHTNING: Missing Spotify views - {collection_timings['missing_views']}")
         
         # Get recent recommendations to avoid duplicates
         recent_recommendations = []
@@ -1462,61 +1547,78 @@ def ai_recommendation_lightning():
         app.logger.info("LIGHTNING: Parsing recommendation...")
         parse_start = time.time()
         
-        # Use the same fast model for parsing
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        parse_prompt = f"""
+        # Fast model for the LLM parse fallback and for search tie-breaks
+        model = gemini_client.get_model(gemini_api_key, 'gemini-1.5-flash')
+        
+        if optimization_result.get('song_title') and optimization_result.get('artist_name'):
+            # Structured output already names the track - no parse call needed
+            song_title = optimization_result['song_title']
+            artist_name = optimization_result['artist_name']
+            parse_confidence = 1.0
+        elif (locally_parsed := parse_recommendation(recommendation_text)) and \
+                locally_parsed.confidence >= PARSE_CONFIDENCE_THRESHOLD:
+            # Common formats are extracted locally in microseconds instead of an LLM round trip
+            song_title = locally_parsed.song_title
+            artist_name = locally_parsed.artist_name
+            parse_confidence = locally_parsed.confidence
+            app.logger.info(f"LIGHTNING: Parsed locally via '{locally_parsed.pattern}' pattern")
+        else:
+            parse_prompt = f"""
 Extract the song title and artist name from this recommendation text. Return only in this exact format:
 SONG: [song title]
 ARTIST: [artist name]
 
 Recommendation text: {recommendation_text}
 """
-        
-        try:
-            parse_response = model.generate_content(parse_prompt)
-            parse_text = parse_response.text.strip()
             
-            # Extract song and artist
-            song_line = [line for line in parse_text.split('\n') if line.startswith('SONG:')]
-            artist_line = [line for line in parse_text.split('\n') if line.startswith('ARTIST:')]
-            
-            if song_line and artist_line:
-                song_title = song_line[0].replace('SONG:', '').strip()
-                artist_name = artist_line[0].replace('ARTIST:', '').strip()
-                parse_confidence = 0.9
-            else:
-                # Fallback parsing
-                lines = parse_text.split('\n')
-                if len(lines) >= 2:
-                    song_title = lines[0].replace('SONG:', '').strip()
-                    artist_name = lines[1].replace('ARTIST:', '').strip()
-                    parse_confidence = 0.6
+            try:
+                parse_response = model.generate_content(parse_prompt)
+                parse_text = parse_response.text.strip()
+                
+                # Extract song and artist
+                song_line = [line for line in parse_text.split('\n') if line.startswith('SONG:')]
+                artist_line = [line for line in parse_text.split('\n') if line.startswith('ARTIST:')]
+                
+                if song_line and artist_line:
+                    song_title = song_line[0].replace('SONG:', '').strip()
+                    artist_name = artist_line[0].replace('ARTIST:', '').strip()
+                    parse_confidence = 0.9
                 else:
-                    raise Exception("Could not parse recommendation")
-                    
-        except Exception as e:
-            app.logger.warning(f"LIGHTNING: Parse failed, using fallback: {str(e)}")
-            # Simple text parsing fallback
-            if '"' in recommendation_text:
-                parts = recommendation_text.split('"')
-                if len(parts) >= 3:
-                    song_title = parts[1]
-                    remaining = parts[2]
-                    if ' by ' in remaining:
-                        artist_name = remaining.split(' by ')[1].split('.')[0].split(',')[0].strip()
+                    # Fallback parsing
+                    lines = parse_text.split('\n')
+                    if len(lines) >= 2:
+                        song_title = lines[0].replace('SONG:', '').strip()
+                        artist_name = lines[1].replace('ARTIST:', '').strip()
+                        parse_confidence = 0.6
                     else:
+                        raise Exception("Could not parse recommendation")
+                        
+            except Exception as e:
+                app.logger.warning(f"LIGHTNING: Parse failed, using fallback: {str(e)}")
+                # Simple text parsing fallback
+                if locally_parsed:
+                    song_title = locally_parsed.song_title
+                    artist_name = locally_parsed.artist_name
+                    parse_confidence = locally_parsed.confidence
+                elif '"' in recommendation_text:
+                    parts = recommendation_text.split('"')
+                    if len(parts) >= 3:
+                        song_title = parts[1]
+                        remaining = parts[2]
+                        if ' by ' in remaining:
+                            artist_name = remaining.split(' by ')[1].split('.')[0].split(',')[0].strip()
+                        else:
+                            artist_name = "Unknown Artist"
+                        parse_confidence = 0.3
+                    else:
+                        song_title = "Unknown Song"
                         artist_name = "Unknown Artist"
-                    parse_confidence = 0.3
+                        parse_confidence = 0.1
                 else:
                     song_title = "Unknown Song"
                     artist_name = "Unknown Artist"
                     parse_confidence = 0.1
-            else:
-                song_title = "Unknown Song"
-                artist_name = "Unknown Artist"
-                parse_confidence = 0.1
-        
+            
         parse_duration = time.time() - parse_start
         app.logger.info(f"LIGHTNING: Parsing complete - {parse_duration:.2f}s - '{song_title}' by {artist_name}")
         
@@ -1524,14 +1626,20 @@ Recommendation text: {recommendation_text}
         app.logger.info("LIGHTNING: Searching Spotify...")
         search_start = time.time()
         
-        spotify_client = SpotifyClient(user.access_token)
+        spotify_client = SpotifyClient(user.access_token, user_id=user.id)
         
         # Use simple concatenated search query
         search_query = f"{song_title} {artist_name}"
         app.logger.info(f"LIGHTNING: Search query: {search_query}")
         
-        # Get more results for LLM to choose from
-        search_results = spotify_client.search_tracks(search_query, limit=10)
+        # Tracks recommended before are answered from the local catalog without a search
+        catalog_track = catalog.catalog.find_track(song_title, artist_name, spotify_client.get_market())
+        if catalog_track:
+            app.logger.info("LIGHTNING: Found track in local catalog, skipping Spotify search")
+            search_results = {'tracks': {'items': [catalog_track]}}
+        else:
+            # Get several results for the local matcher to rank
+            search_results = spotify_client.search_tracks(search_query, limit=10)
         
         if not search_results or not search_results.get('tracks', {}).get('items'):
             app.logger.error(f"LIGHTNING: No search results for '{search_query}'")
@@ -1545,13 +1653,13 @@ Recommendation text: {recommendation_text}
                 'search_attempted': True
             }), 404
         
-        # Use LLM to select the best result
-        app.logger.info("LIGHTNING: LLM selecting best result...")
+        # Rank results locally; the LLM is only consulted to break ties between different songs
+        app.logger.info("LIGHTNING: Selecting best result...")
         selection_start = time.time()
         
         try:
-            selection_result = structured_llm.select_spotify_result(
-                model, song_title, artist_name, search_results['tracks']['items']
+            selection_result = select_spotify_result(
+                song_title, artist_name, search_results['tracks']['items'], model=model
             )
             
             selected_track_data = selection_result.selected_result
@@ -1578,12 +1686,12 @@ Recommendation text: {recommendation_text}
             app.logger.info(f"LIGHTNING: Selection reasoning - {selection_reasoning}")
             
         except Exception as e:
-            app.logger.warning(f"LIGHTNING: LLM selection failed, using first result: {str(e)}")
+            app.logger.warning(f"LIGHTNING: Result selection failed, using first result: {str(e)}")
             # Fallback to first result
             recommended_track = search_results['tracks']['items'][0]
             match_score = 0.5
             selection_confidence = 0.5
-            selection_reasoning = "Fallback selection: Used first search result due to AI processing failure"
+            selection_reasoning = "Fallback selection: Used first search result because ranking failed"
         
         selection_duration = time.time() - selection_start
         search_duration = time.time() - search_start
@@ -1618,6 +1726,9 @@ Recommendation text: {recommendation_text}
         app.logger.info("LIGHTNING AI RECOMMENDATION PERFORMANCE SUMMARY")
         app.logger.info(">" * 60)
         app.logger.info(f"Data Collection:     {data_collection_duration:.2f}s")
+        if collection_timings:
+            app.logger.info(f"  Spotify Fetch:     {collection_timings['fetch_duration']:.2f}s")
+            app.logger.info(f"  Projection:        {collection_timings['project_duration']:.3f}s")
         app.logger.info(f"Profile (Cached):    {optimization_stats['profile_duration']:.2f}s")
         app.logger.info(f"Recommendation:      {optimization_stats['rec_duration']:.2f}s")
         app.logger.info(f"Track Parsing:       {parse_duration:.2f}s")
@@ -1666,6 +1777,7 @@ Recommendation text: {recommendation_text}
                 'approach': 'lightning_structured_search_immediate',
                 'cached_profile': optimization_stats['cached_profile'],
                 'cached_data': cached_music_data is not None,
+                'data_collection': collection_timings,
                 'match_score': round(match_score, 2),
                 'parse_confidence': round(parse_confidence, 2),
                 'selection_confidence': round(selection_confidence, 2),
@@ -1699,7 +1811,7 @@ def generate_music_taste_profile():
             }), 400
         
         # Initialize Spotify client
-        spotify_client = SpotifyClient(user.access_token)
+        spotify_client = SpotifyClient(user.access_token, user_id=user.id)
         
         # Generate music taste insights with the provided API key
         app.logger.info("Generating music taste profile with user's API key...")
@@ -0,0 +1,301 @@
+import os
+import json
+import time
+import secrets
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import Signer, BadSignature
+
+# Seconds between sweeps of expired sessions, per worker
+SESSION_SWEEP_INTERVAL = int(os.environ.get('SESSION_SWEEP_INTERVAL', 600))
+# Server-side lifetime of non-permanent sessions, whose cookie lasts until the
+# browser closes; sliding, so only idle sessions expire
+SESSION_NON_PERMANENT_LIFETIME = timedelta(seconds=int(os.environ.get('SESSION_NON_PERMANENT_LIFETIME', 6 * 3600)))
+
+
+class ServerSideSession(SessionMixin):
+    """Session whose data lives in a server-side store and is loaded on first access.
+    
+    Only the signed session id travels in the cookie. Requests that never
+    touch the session never hit the store, and the store is only written
+    when the data was actually changed.
+    """
+    
+    def __init__(self, sid, loader=None, new=False):
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        self._loader = loader
+        self._data = {} if new or loader is None else None
+    
+    @property
+    def loaded(self):
+        return self._data is not None
+    
+    def _load(self):
+        self.accessed = True
+        if self._data is None:
+            self._data = self._loader() or {}
+        return self._data
+    
+    def __getitem__(self, key):
+        return self._load()[key]
+    
+    def __setitem__(self, key, value):
+        self._load()[key] = value
+        self.modified = True
+    
+    def __delitem__(self, key):
+        del self._load()[key]
+        self.modified = True
+    
+    def __iter__(self):
+        return iter(self._load())
+    
+    def __len__(self):
+        return len(self._load())
+    
+    def clear(self):
+        self._load().clear()
+        self.modified = True
+
+
+class SqlSessionStore:
+    """Stores sessions in the server_session table of the app database"""
+    
+    def __init__(self, db):
+        from models import ServerSession
+        # Bound once at startup so sweeps and saves work outside a request context
+        self.engine = db.engine
+        self.table = ServerSession.__table__
+    
+    def load(self, sid):
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                self.table.select().where(self.table.c.sid == sid)
+            ).first()
+        if row is None or row.expires_at <= datetime.utcnow():
+            return None
+        return row.data, row.expires_at
+    
+    def save(self, sid, data, expires_at):
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                self.table.update().where(self.table.c.sid == sid).values(data=data, expires_at=expires_at)
+            )
+            if result.rowcount == 0:
+                conn.execute(self.table.insert().values(sid=sid, data=data, expires_at=expires_at))
+    
+    def touch(self, sid, expires_at):
+        with self.engine.begin() as conn:
+            conn.execute(self.table.update().where(self.table.c.sid == sid).values(expires_at=expires_at))
+    
+    def delete(self, sid):
+        with self.engine.begin() as conn:
+            conn.execute(self.table.delete().where(self.table.c.sid == sid))
+    
+    def sweep(self):
+        with self.engine.begin() as conn:
+            result = conn.execute(self.table.delete().where(self.table.c.expires_at <= datetime.utcnow()))
+        return result.rowcount
+
+
+class FileSessionStore:
+    """Stores each session as a small JSON file shared by all workers on the host"""
+    
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+    
+    def _path(self, sid):
+        return os.path.join(self.directory, f'{sid}.session')
+    
+    def _read(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+            return record['data'], datetime.fromtimestamp(record['expires_at'], timezone.utc).replace(tzinfo=None)
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    def _write(self, sid, data, expires_at):
+        path = self._path(sid)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        record = {'data': data, 'expires_at': expires_at.replace(tzinfo=timezone.utc).timestamp()}
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f)
+        # Atomic on POSIX, so concurrent readers never see a half-written file
+        os.replace(tmp_path, path)
+    
+    def load(self, sid):
+        record = self._read(self._path(sid))
+        if record is None or record[1] <= datetime.utcnow():
+            return None
+        return record
+    
+    def save(self, sid, data, expires_at):
+        self._write(sid, data, expires_at)
+    
+    def touch(self, sid, expires_at):
+        record = self._read(self._path(sid))
+        if record is not None:
+            self._write(sid, record[0], expires_at)
+    
+    def delete(self, sid):
+        try:
+            os.remove(self._path(sid))
+        except FileNotFoundError:
+            pass
+    
+    def sweep(self):
+        removed = 0
+        now = datetime.utcnow()
+        for name in os.listdir(self.directory):
+            if not name.endswith('.session'):
+                continue
+            path = os.path.join(self.directory, name)
+            record = self._read(path)
+            if record is None or record[1] <= now:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface that keeps session data in a pluggable server-side store"""
+    
+    serializer = TaggedJSONSerializer()
+    
+    def __init__(self, store, sweep_interval=SESSION_SWEEP_INTERVAL):
+        self.store = store
+        self.sweep_interval = sweep_interval
+        self.last_sweep = time.monotonic()
+        self.sweep_lock = threading.Lock()
+    
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='server-side-session')
+    
+    def _lifetime(self, app, session):
+        if session.permanent:
+            return app.permanent_session_lifetime
+        return min(SESSION_NON_PERMANENT_LIFETIME, app.permanent_session_lifetime)
+    
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+        
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode('utf-8')
+            except BadSignature:
+                sid = None
+            if sid:
+                session = ServerSideSession(sid, loader=lambda: self._load(session))
+                return session
+        
+        return ServerSideSession(secrets.token_urlsafe(32), new=True)
+    
+    def _load(self, session):
+        record = self.store.load(session.sid)
+        if record is None:
+            # Unknown or expired id: start over under a fresh one
+            session.sid = secrets.token_urlsafe(32)
+            session.new = True
+            return None
+        
+        data, expires_at = record
+        session.stored_expires_at = expires_at
+        try:
+            return self.serializer.loads(data)
+        except ValueError:
+            logging.warning("Discarding unreadable server-side session")
+            return None
+    
+    def save_session(self, app, session, response):
+        self._maybe_sweep()
+        
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        partitioned = self.get_cookie_partitioned(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+        
+        if session.accessed:
+            response.vary.add('Cookie')
+        
+        # Never loaded means never read or written: nothing to save or refresh
+        if not session.loaded:
+            return
+        
+        if not session:
+            if session.modified:
+                if not session.new:
+                    self.store.delete(session.sid)
+                response.delete_cookie(
+                    name, domain=domain, path=path, secure=secure,
+                    partitioned=partitioned, samesite=samesite, httponly=httponly
+                )
+                response.vary.add('Cookie')
+            return
+        
+        expires_at = datetime.utcnow() + self._lifetime(app, session)
+        if session.modified:
+            self.store.save(session.sid, self.serializer.dumps(dict(session)), expires_at)
+        else:
+            # Sliding expiry without rewriting unchanged data on every request
+            stored_expires_at = getattr(session, 'stored_expires_at', None)
+            if stored_expires_at and stored_expires_at - datetime.utcnow() < self._lifetime(app, session) / 2:
+                self.store.touch(session.sid, expires_at)
+        
+        if session.modified or session.new or (session.permanent and app.config['SESSION_REFRESH_EACH_REQUEST']):
+            response.set_cookie(
+                name,
+                self._signer(app).sign(session.sid).decode('utf-8'),
+                expires=self.get_expiration_time(app, session),
+                httponly=httponly,
+                domain=domain,
+                path=path,
+                secure=secure,
+                partitioned=partitioned,
+                samesite=samesite
+            )
+            response.vary.add('Cookie')
+    
+    def _maybe_sweep(self):
+        if time.monotonic() - self.last_sweep < self.sweep_interval:
+            return
+        if not self.sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self.last_sweep = time.monotonic()
+            removed = self.store.sweep()
+            if removed:
+                logging.info(f"Swept {removed} expired server-side sessions")
+        except Exception as e:
+            logging.error(f"Session sweep failed: {e}")
+        finally:
+            self.sweep_lock.release()
+
+
+def create_session_interface(app, db):
+    """Build the session interface selected by the SESSION_TYPE config value"""
+    session_type = app.config.get('SESSION_TYPE', 'sqlalchemy')
+    if session_type == 'sqlalchemy':
+        store = SqlSessionStore(db)
+    elif session_type == 'filesystem':
+        directory = app.config.get('SESSION_FILE_DIR') or os.path.join(app.instance_path, 'sessions')
+        store = FileSessionStore(directory)
+    else:
+        raise ValueError(f"Unsupported SESSION_TYPE: {session_type}")
+    return ServerSideSessionInterface(store)
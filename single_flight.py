@@ -0,0 +1,65 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls so only one of them does the work.
+    
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for it and share its result (or its exception). Once
+    the call finishes the key is forgotten, so this never serves stale data.
+    """
+    
+    def __init__(self, wait_timeout=30.0):
+        self.wait_timeout = wait_timeout
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+    
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self.calls[key] = call
+                self.executed += 1
+                leader = True
+        
+        if not leader:
+            if call.done.wait(self.wait_timeout):
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            # The leader is stuck; don't let followers hang with it
+            return fn()
+        
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+            call.done.set()
+    
+    def get_stats(self):
+        with self.lock:
+            total = self.executed + self.coalesced
+            return {
+                'in_flight': len(self.calls),
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'coalesced_ratio': round(self.coalesced / total, 3) if total else 0.0
+            }
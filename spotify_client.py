@@ -1,45 +1,423 @@
+import os
+import re
+import time
+import hashlib
+import threading
 import requests
 import logging
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from rate_limiter import (
+    spotify_rate_limiter, retry_delay, backoff_delay, RETRYABLE_STATUS_CODES, SPOTIFY_RETRY_BUDGET
+)
+from ttl_cache import TTLCache, MISSING
+from single_flight import SingleFlight
+
+# Fan-out settings: worker threads shared by concurrent Spotify fetches, the
+# default deadline for a whole fan-out and the per-request socket timeout
+SPOTIFY_FANOUT_WORKERS = int(os.environ.get('SPOTIFY_FANOUT_WORKERS', 8))
+SPOTIFY_FANOUT_DEADLINE = float(os.environ.get('SPOTIFY_FANOUT_DEADLINE', 5.0))
+SPOTIFY_REQUEST_TIMEOUT = float(os.environ.get('SPOTIFY_REQUEST_TIMEOUT', 10.0))
+
+# Connection pool settings for the shared Spotify transport. Each gunicorn
+# worker gets its own pool, so size these per worker, not per deployment.
+# Every thread that can call Spotify at the same time needs a pooled
+# connection, or the extra connections are opened and thrown away again:
+# the gthread request threads (--threads 8 in the Procfile), the fan-out
+# pool, the playlist-resolve pool, plus a margin for playback pollers and
+# library scans. Raise it together with any of those.
+SPOTIFY_REQUEST_THREADS = 8
+SPOTIFY_BACKGROUND_THREADS = 8
+SPOTIFY_POOL_CONNECTIONS = int(os.environ.get('SPOTIFY_POOL_CONNECTIONS', 4))
+SPOTIFY_POOL_MAXSIZE = int(os.environ.get('SPOTIFY_POOL_MAXSIZE', (
+    SPOTIFY_REQUEST_THREADS + SPOTIFY_FANOUT_WORKERS
+    + int(os.environ.get('PLAYLIST_RESOLVE_WORKERS', 8)) + SPOTIFY_BACKGROUND_THREADS
+)))
+
+# Per-user response cache for read-only endpoints, capped per worker
+SPOTIFY_CACHE_MAX_BYTES = int(os.environ.get('SPOTIFY_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+# TTLs in seconds for cacheable GET endpoints, matched on the path without its
+# query string. Top-* data changes at most daily; player state is never cached.
+RESPONSE_CACHE_TTLS = [
+    ('/me/top/', 6 * 3600),
+    ('/me/player/recently-played', 60),
+    ('/me/playlists', 300),
+    ('/me/tracks', 300),
+    ('/playlists/', 300),
+]
+
+response_cache = TTLCache(SPOTIFY_CACHE_MAX_BYTES, name='spotify_responses')
+
+# Search results depend only on the market searched, so one cache serves every
+# user in the same country. A not-found query is remembered for less time in
+# case the catalog catches up.
+SPOTIFY_SEARCH_CACHE_MAX_BYTES = int(os.environ.get('SPOTIFY_SEARCH_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+SPOTIFY_SEARCH_TTL = int(os.environ.get('SPOTIFY_SEARCH_TTL', 24 * 3600))
+SPOTIFY_SEARCH_NEGATIVE_TTL = int(os.environ.get('SPOTIFY_SEARCH_NEGATIVE_TTL', 3600))
+
+search_cache = TTLCache(SPOTIFY_SEARCH_CACHE_MAX_BYTES, default_ttl=SPOTIFY_SEARCH_TTL, name='spotify_search')
+
+# Spotify user id per access token, so a client built from a bare token
+# resolves /me once per token instead of once per request; also each user's
+# market, keyed ('market', cache_scope)
+identity_cache = TTLCache(1024 * 1024, default_ttl=3600, name='spotify_identity')
+
+# Callables handed every fresh GET payload, e.g. to populate the track catalog
+response_observers = []
+
+# Shares one upstream call between concurrent identical GETs (e.g. several
+# tabs polling the player for the same user at the same moment)
+request_coalescer = SingleFlight()
+
+
+# Spotify accepts at most 100 URIs per add-to-playlist call; a failed chunk
+# is retried this many times once it is confirmed not to have been applied
+PLAYLIST_ADD_CHUNK_SIZE = 100
+PLAYLIST_ADD_RETRIES = int(os.environ.get('PLAYLIST_ADD_RETRIES', 2))
+
+
+# Maximum ids per request for the batch catalog endpoints
+SEVERAL_TRACKS_MAX = 50
+SEVERAL_ARTISTS_MAX = 50
+AUDIO_FEATURES_MAX = 100
+
+
+# Fields of /me/player that make up the /me/player/currently-playing response
+CURRENTLY_PLAYING_FIELDS = (
+    'timestamp', 'context', 'progress_ms', 'item',
+    'currently_playing_type', 'actions', 'is_playing'
+)
+
+
+def get_cache_ttl(endpoint):
+    """Return the response cache TTL for an endpoint, or 0 if it must not be cached"""
+    path = endpoint.split('?', 1)[0]
+    for prefix, ttl in RESPONSE_CACHE_TTLS:
+        if path.startswith(prefix):
+            return ttl
+    return 0
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def chunk_uris(track_uris, size=PLAYLIST_ADD_CHUNK_SIZE):
+    """Split any iterable of URIs into lists of at most ``size``, consuming it lazily"""
+    iterator = iter(track_uris)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def token_fingerprint(access_token):
+    """Short hash of an access token, safe to use in cache keys"""
+    return hashlib.sha256(access_token.encode('utf-8')).hexdigest()[:16]
+
+
+def get_http_session():
+    """Return the process-wide keep-alive session shared by all SpotifyClient instances"""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                # A forked worker must not reuse sockets inherited from its parent
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=SPOTIFY_POOL_CONNECTIONS,
+                    pool_maxsize=SPOTIFY_POOL_MAXSIZE,
+                    pool_block=False
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+                _session_pid = pid
+    return _session
+
+
+def get_pool_stats():
+    """Report connection reuse for the shared transport.
+
+    A pool hit is a request served over an already-open keep-alive connection;
+    a miss is a request that had to open a new TCP+TLS connection.
+    """
+    stats = {'hosts': {}, 'requests': 0, 'pool_hits': 0, 'pool_misses': 0}
+    if _session is None:
+        return stats
+    
+    adapter = _session.get_adapter('https://')
+    pools = adapter.poolmanager.pools
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        requests_made = pool.num_requests
+        connections_made = pool.num_connections
+        stats['hosts'][pool.host] = {
+            'requests': requests_made,
+            'pool_hits': max(requests_made - connections_made, 0),
+            'pool_misses': connections_made
+        }
+        stats['requests'] += requests_made
+        stats['pool_hits'] += max(requests_made - connections_made, 0)
+        stats['pool_misses'] += connections_made
+    
+    stats['hit_ratio'] = round(stats['pool_hits'] / stats['requests'], 3) if stats['requests'] else 0.0
+    return stats
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the bounded thread pool used for concurrent Spotify calls"""
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(
+                    max_workers=SPOTIFY_FANOUT_WORKERS,
+                    thread_name_prefix='spotify-fanout'
+                )
+                _executor_pid = pid
+    return _executor
+
+
+def add_response_observer(observer):
+    """Register a callable to receive every successful GET payload from Spotify"""
+    response_observers.append(observer)
+
+
+def notify_response_observers(payload):
+    """Hand a payload to every observer; observers must be cheap and never break a request"""
+    for observer in response_observers:
+        try:
+            observer(payload)
+        except Exception as e:
+            logging.warning(f"Spotify response observer failed: {e}")
+
+
+_SEARCH_TOKEN = re.compile(r'(\w+):"([^"]*)"|(\w+):(\S+)|"([^"]*)"|(\S+)')
+_SEARCH_QUOTES = str.maketrans({'“': '"', '”': '"', '„': '"', '‘': "'", '’': "'"})
+
+
+def normalize_search_query(query):
+    """Canonical form of a search query for cache keys.
+    
+    Case, whitespace and quoting are ignored, and field filters such as
+    track:"..." and artist:"..." are sorted, so 'track:"Testify" artist:"RATM"'
+    and 'artist:ratm  track:testify' share a key. 'track:"a b"' does not share
+    one with 'track:a b', which Spotify reads as a filter plus a free term.
+    """
+    fields = []
+    terms = []
+    for match in _SEARCH_TOKEN.finditer(query.translate(_SEARCH_QUOTES).casefold()):
+        quoted_field, quoted_value, field, value, quoted_term, term = match.groups()
+        if quoted_field or field:
+            fields.append(f'{quoted_field or field}:"{" ".join((quoted_value if quoted_field else value).split())}"')
+        else:
+            terms.append(' '.join((quoted_term if quoted_term is not None else term).split()))
+    return ' '.join(sorted(fields) + [term for term in terms if term])
+
+
+def on_fanout_thread():
+    """True on a fan-out worker, where waiting on more pool work could deadlock the pool"""
+    return threading.current_thread().name.startswith('spotify-fanout')
+
+
+def fetch_concurrently(calls, deadline=None):
+    """Run independent Spotify calls concurrently with partial-result semantics.
+
+    ``calls`` maps a name to a zero-argument callable. Every call runs on the
+    shared fan-out pool; the result dict maps each name to the call's return
+    value, or None if the call raised or had not finished by the deadline.
+    One slow endpoint therefore degrades the result instead of blocking it.
+    """
+    deadline = SPOTIFY_FANOUT_DEADLINE if deadline is None else deadline
+    start_time = time.time()
+    
+    executor = get_executor()
+    futures = {executor.submit(call): name for name, call in calls.items()}
+    done, not_done = wait(futures, timeout=deadline)
+    
+    results = {}
+    for future, name in futures.items():
+        if future in not_done:
+            future.cancel()
+            logging.warning(f"Spotify fan-out call '{name}' missed the {deadline:.1f}s deadline")
+            results[name] = None
+            continue
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            logging.error(f"Spotify fan-out call '{name}' failed: {e}")
+            results[name] = None
+    
+    logging.debug(f"Spotify fan-out of {len(calls)} calls finished in {time.time() - start_time:.2f}s "
+                  f"({len(not_done)} timed out)")
+    return results
+
+
+def parse_response(response):
+    """Turn a Spotify API response into the client's return convention.
+
+    Parsed JSON for a body, True for success without a body, None for
+    any error status.
+    """
+    if response.status_code == 204:  # No content
+        return True
+    
+    if response.status_code in [200, 201]:
+        if response.content:
+            try:
+                return response.json()
+            except ValueError:
+                return True
+        return True
+    
+    logging.error(f"Spotify API error: {response.status_code} - {response.text}")
+    return None
+
 
 class SpotifyClient:
     """Client for interacting with Spotify Web API"""
     
-    def __init__(self, access_token):
+    def __init__(self, access_token, user_id=None):
         self.access_token = access_token
+        self.user_id = user_id
         self.base_url = 'https://api.spotify.com/v1'
         self.headers = {
             'Authorization': f'Bearer {access_token}',
             'Content-Type': 'application/json'
         }
     
+    @property
+    def token_fingerprint(self):
+        return token_fingerprint(self.access_token)
+    
+    @property
+    def cache_scope(self):
+        """Key that isolates this user's cached responses from everyone else's"""
+        if self.user_id:
+            return f'user:{self.user_id}'
+        return f'token:{self.token_fingerprint}'
+    
+    def get_current_user_id(self):
+        """Spotify id of the token's owner.
+        
+        Taken from the id the client was built with (the stored User.id),
+        else from an earlier /me call for the same token, else from /me.
+        """
+        if self.user_id:
+            return self.user_id
+        
+        user_id = identity_cache.get(self.token_fingerprint)
+        if user_id is not MISSING:
+            self.user_id = user_id
+            return user_id
+        
+        self.get_user_profile()
+        return self.user_id
+    
+    def get_market(self):
+        """Country code of the token's owner, which Spotify filters search results by.
+        
+        Remembered per user like the user id; None if /me failed or did not
+        carry a country.
+        """
+        market = identity_cache.get(('market', self.cache_scope))
+        if market is MISSING:
+            self.get_user_profile()
+            market = identity_cache.get(('market', self.cache_scope), None)
+        return market
+    
+    def invalidate_cache(self, *prefixes):
+        """Drop this user's cached responses whose endpoint starts with any prefix"""
+        scope = self.cache_scope
+        return response_cache.delete_where(
+            lambda key: key[0] == scope and key[1].startswith(prefixes)
+        )
+    
     def _make_request(self, method, endpoint, **kwargs):
-        """Make a request to Spotify API with error handling"""
+        """Make a request to Spotify API; GETs are served from cache or coalesced with identical in-flight calls"""
+        if method != 'GET':
+            return self._send_request(method, endpoint, **kwargs)
+        
+        ttl = get_cache_ttl(endpoint)
+        cache_key = (self.cache_scope, endpoint)
+        if ttl:
+            cached = response_cache.get(cache_key)
+            if cached is not MISSING:
+                return cached
+        
+        flight_key = (self.cache_scope, method, endpoint, repr(sorted((kwargs.get('params') or {}).items())))
+        result = request_coalescer.do(flight_key, lambda: self._send_request(method, endpoint, **kwargs))
+        if not ttl:
+            return result
+        
+        # Only cache real payloads; errors and empty 204s are always refetched
+        if isinstance(result, dict):
+            response_cache.set(cache_key, result, ttl=ttl)
+        return result
+    
+    def _send_request(self, method, endpoint, **kwargs):
+        """Send a request to Spotify API with rate limiting, retries and error handling"""
         url = f"{self.base_url}{endpoint}"
+        kwargs.setdefault('timeout', SPOTIFY_REQUEST_TIMEOUT)
         
-        try:
-            response = requests.request(method, url, headers=self.headers, **kwargs)
+        waited = 0.0
+        attempt = 0
+        while True:
+            # Draw from the worker-wide bucket before every attempt, retries included
+            throttle = spotify_rate_limiter.reserve(max_wait=SPOTIFY_RETRY_BUDGET - waited)
+            if throttle is None:
+                logging.error(f"Spotify rate limit budget exhausted for {method} {endpoint}")
+                return None
+            if throttle > 0:
+                time.sleep(throttle)
+                waited += throttle
             
-            if response.status_code == 204:  # No content
-                return True
-            
-            if response.status_code in [200, 201]:
-                if response.content:
-                    try:
-                        return response.json()
-                    except ValueError:
-                        return True
-                return True
-            
-            logging.error(f"Spotify API error: {response.status_code} - {response.text}")
-            return None
+            try:
+                response = get_http_session().request(method, url, headers=self.headers, **kwargs)
+            except requests.RequestException as e:
+                delay = retry_delay(method, None, None, attempt)
+                if delay is None or waited + delay > SPOTIFY_RETRY_BUDGET:
+                    logging.error(f"Request failed: {e}")
+                    return None
+                logging.warning(f"Request failed, retrying in {delay:.2f}s: {e}")
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    result = parse_response(response)
+                    if method == 'GET' and isinstance(result, dict):
+                        notify_response_observers(result)
+                    return result
+                
+                delay = retry_delay(method, response.status_code, response.headers.get('Retry-After'), attempt)
+                if delay is None or waited + delay > SPOTIFY_RETRY_BUDGET:
+                    return parse_response(response)
+                logging.warning(f"Spotify API {response.status_code} for {method} {endpoint}, "
+                                f"retrying in {delay:.2f}s (attempt {attempt + 1})")
             
-        except requests.RequestException as e:
-            logging.error(f"Request failed: {e}")
-            return None
+            time.sleep(delay)
+            waited += delay
+            attempt += 1
     
     def get_user_profile(self):
-        """Get current user's profile"""
-        return self._make_request('GET', '/me')
+        """Get current user's profile and remember the user id and market it carries"""
+        profile = self._make_request('GET', '/me')
+        if isinstance(profile, dict) and profile.get('id'):
+            identity_cache.set(self.token_fingerprint, profile['id'])
+            self.user_id = self.user_id or profile['id']
+            identity_cache.set(('market', self.cache_scope), profile.get('country'))
+        return profile
     
     def get_user_playlists(self, limit=20):
         """Get current user's playlists"""
@@ -53,6 +431,31 @@ class SpotifyClient:
         """Get current playback state"""
         return self._make_request('GET', '/me/player')
     
+    def get_playback_snapshot(self):
+        """Get the current track and playback state from a single /me/player call.
+        
+        /me/player already carries everything /me/player/currently-playing
+        returns, so the current-track view is derived from it. Only when
+        /me/player has no active device (204) is currently-playing queried.
+        """
+        playback_state = self.get_playback_state()
+        
+        if isinstance(playback_state, dict):
+            current_track = {
+                key: playback_state[key]
+                for key in CURRENTLY_PLAYING_FIELDS
+                if key in playback_state
+            }
+        elif playback_state is True:
+            current_track = self.get_current_track()
+        else:
+            current_track = None
+        
+        return {
+            'current_track': current_track,
+            'playback_state': playback_state
+        }
+    
     def play(self, device_id=None):
         """Resume playback"""
         endpoint = '/me/player/play'
@@ -122,11 +525,139 @@ class SpotifyClient:
         """Get user's saved (liked) tracks"""
         return self._make_request('GET', f'/me/tracks?limit={limit}')
     
+    def iter_pages(self, endpoint, max_items=None, time_budget=None, prefetch=True):
+        """Yield the items of a paginated collection, following Spotify's ``next`` links.
+        
+        While the caller works through one page, the next is fetched on the
+        fan-out pool. At most one page is buffered ahead, so memory stays
+        constant however large the collection is. Iteration stops after
+        ``max_items`` items, or at the first page boundary after
+        ``time_budget`` seconds.
+        """
+        give_up_at = time.monotonic() + time_budget if time_budget is not None else None
+        prefetch = prefetch and not on_fanout_thread()
+        yielded = 0
+        pending = None
+        
+        page = self._make_request('GET', endpoint)
+        try:
+            while isinstance(page, dict):
+                items = page.get('items') or []
+                next_endpoint = self._next_endpoint(page)
+                wants_more = max_items is None or yielded + len(items) < max_items
+                # Later pages skip the response cache: a full library would crowd out everything else
+                if next_endpoint and wants_more and prefetch:
+                    pending = get_executor().submit(self._send_request, 'GET', next_endpoint)
+                
+                for item in items:
+                    yield item
+                    yielded += 1
+                    if max_items is not None and yielded >= max_items:
+                        return
+                
+                if not next_endpoint:
+                    return
+                if give_up_at is not None and time.monotonic() >= give_up_at:
+                    logging.info(f"Stopped paging {endpoint} after {yielded} items: time budget spent")
+                    return
+                page = pending.result() if pending else self._send_request('GET', next_endpoint)
+                pending = None
+        finally:
+            if pending is not None:
+                pending.cancel()
+    
+    def _next_endpoint(self, page):
+        next_url = page.get('next')
+        if next_url and next_url.startswith(self.base_url):
+            return next_url[len(self.base_url):]
+        return None
+    
+    def iter_user_playlists(self, page_size=50, **kwargs):
+        """Stream all of the user's playlists; see iter_pages for max_items/time_budget"""
+        return self.iter_pages(f'/me/playlists?limit={page_size}', **kwargs)
+    
+    def iter_playlist_tracks(self, playlist_id, page_size=100, **kwargs):
+        """Stream every track of a playlist"""
+        return self.iter_pages(f'/playlists/{playlist_id}/tracks?limit={page_size}', **kwargs)
+    
+    def iter_saved_tracks(self, page_size=50, **kwargs):
+        """Stream the user's whole saved (liked) library"""
+        return self.iter_pages(f'/me/tracks?limit={page_size}', **kwargs)
+    
+    def iter_recently_played(self, page_size=50, **kwargs):
+        """Stream recently played tracks, newest first, following the ``before`` cursor"""
+        return self.iter_pages(f'/me/player/recently-played?limit={page_size}', **kwargs)
+    
+    def _get_several(self, path, key, ids, max_ids):
+        """Fetch catalog objects by id through a batch endpoint.
+        
+        Ids are deduplicated and split at the endpoint's maximum, and the
+        chunks run concurrently. Returns a dict of id to object; ids Spotify
+        does not know, or whose chunk failed, are simply absent.
+        """
+        unique_ids = list(dict.fromkeys(item_id for item_id in ids if item_id))
+        calls = {
+            f'{path}[{start}]': (lambda chunk=unique_ids[start:start + max_ids]:
+                                 self._make_request('GET', f"{path}?ids={','.join(chunk)}"))
+            for start in range(0, len(unique_ids), max_ids)
+        }
+        if len(calls) > 1 and not on_fanout_thread():
+            responses = fetch_concurrently(calls).values()
+        else:
+            responses = [call() for call in calls.values()]
+        
+        merged = {}
+        for response in responses:
+            for obj in (response or {}).get(key) or []:
+                if obj and obj.get('id'):
+                    merged[obj['id']] = obj
+        return merged
+    
+    def get_several_tracks(self, track_ids):
+        """Get full track objects for any number of ids, 50 per request"""
+        return self._get_several('/tracks', 'tracks', track_ids, SEVERAL_TRACKS_MAX)
+    
+    def get_several_artists(self, artist_ids):
+        """Get full artist objects (with genres) for any number of ids, 50 per request"""
+        return self._get_several('/artists', 'artists', artist_ids, SEVERAL_ARTISTS_MAX)
+    
+    def get_audio_features(self, track_ids):
+        """Get audio features for any number of track ids, 100 per request"""
+        return self._get_several('/audio-features', 'audio_features', track_ids, AUDIO_FEATURES_MAX)
+    
     def search_tracks(self, query, limit=1):
-        """Search for tracks"""
+        """Search for tracks playable in the user's market.
+        
+        Results are shared through the search cache by all users in the same
+        market. If the market is unknown the search runs with market=from_token
+        and is only shared with the same token.
+        """
         from urllib.parse import quote
+        market = self.get_market()
+        cache_key = (normalize_search_query(query), limit, market or f'token:{self.token_fingerprint}')
+        cached = search_cache.get(cache_key)
+        if cached is not MISSING:
+            return cached
+        
         encoded_query = quote(query)
-        return self._make_request('GET', f'/search?q={encoded_query}&type=track&limit={limit}')
+        endpoint = f'/search?q={encoded_query}&type=track&limit={limit}&market={market or "from_token"}'
+        ran_here = []
+        
+        def search():
+            ran_here.append(True)
+            return self._make_request('GET', endpoint)
+        
+        # Identical searches from users in the same market share one upstream call too
+        result = request_coalescer.do(('search',) + cache_key, search)
+        if not isinstance(result, dict) and not ran_here:
+            # The shared call failed on another user's token (e.g. a 401); ours may be fine
+            result = self._make_request('GET', endpoint)
+        
+        # Errors are never cached; empty results are, for a shorter time
+        if isinstance(result, dict):
+            found = bool(result.get('tracks', {}).get('items'))
+            search_cache.set(cache_key, result, ttl=SPOTIFY_SEARCH_TTL if found else SPOTIFY_SEARCH_NEGATIVE_TTL)
+        return result
     
     def play_track(self, track_uri, device_id=None):
         """Play a specific track"""
@@ -140,24 +671,79 @@ class SpotifyClient:
     
     def create_playlist(self, name, description="", public=False):
         """Create a new playlist for the user"""
-        # First get user profile to get user ID
-        profile = self.get_user_profile()
-        if not profile:
+        user_id = self.get_current_user_id()
+        if not user_id:
             return None
         
-        user_id = profile['id']
         data = {
             'name': name,
             'description': description,
             'public': public
         }
         
-        return self._make_request('POST', f'/users/{user_id}/playlists', json=data)
+        result = self._make_request('POST', f'/users/{user_id}/playlists', json=data)
+        if result:
+            self.invalidate_cache('/me/playlists')
+        return result
     
     def add_tracks_to_playlist(self, playlist_id, track_uris):
-        """Add tracks to a playlist"""
-        data = {
-            'uris': track_uris
-        }
+        """Add tracks to a playlist in order, 100 URIs per request.
+        
+        ``track_uris`` may be a list or any iterator, so a generator that is
+        still resolving tracks can be written as it produces them. Returns
+        the final snapshot_id with added/failed counts, or None if nothing
+        was added.
+        """
+        snapshot_id = None
+        added = 0
+        failed = 0
+        
+        for chunk in chunk_uris(track_uris):
+            result = self._add_chunk(playlist_id, chunk)
+            if result:
+                added += len(chunk)
+                if isinstance(result, dict):
+                    snapshot_id = result.get('snapshot_id', snapshot_id)
+            else:
+                failed += len(chunk)
+                logging.error(f"Failed to add {len(chunk)} tracks to playlist {playlist_id}")
+        
+        if not added:
+            return None
+        self.invalidate_cache('/me/playlists', f'/playlists/{playlist_id}')
+        return {'snapshot_id': snapshot_id, 'tracks_added': added, 'tracks_failed': failed}
+    
+    def _add_chunk(self, playlist_id, chunk):
+        """POST one chunk, retrying only when the playlist shows it was not applied"""
+        for attempt in range(PLAYLIST_ADD_RETRIES + 1):
+            result = self._make_request('POST', f'/playlists/{playlist_id}/tracks', json={'uris': chunk})
+            if result:
+                return result
+            
+            # A failed POST may still have been applied; retrying blindly would duplicate tracks
+            applied = self._chunk_applied(playlist_id, chunk)
+            if applied:
+                return True
+            if applied is None or attempt == PLAYLIST_ADD_RETRIES:
+                return None
+            delay = backoff_delay(attempt)
+            logging.warning(f"Retrying add of {len(chunk)} tracks to playlist {playlist_id} in {delay:.2f}s")
+            time.sleep(delay)
+        return None
+    
+    def _chunk_applied(self, playlist_id, chunk):
+        """True if the playlist ends with ``chunk``, False if not, None if that cannot be checked"""
+        # Bypass the response cache: this must see the playlist as it is now
+        info = self._send_request('GET', f'/playlists/{playlist_id}?fields=tracks.total')
+        if not isinstance(info, dict):
+            return None
+        total = info.get('tracks', {}).get('total', 0)
+        if total < len(chunk):
+            return False
         
-        return self._make_request('POST', f'/playlists/{playlist_id}/tracks', json=data)
+        tail = self._send_request(
+            'GET', f'/playlists/{playlist_id}/tracks?fields=items(track(uri))&offset={total - len(chunk)}&limit={len(chunk)}'
+        )
+        if not isinstance(tail, dict):
+            return None
+        return [(item.get('track') or {}).get('uri') for item in tail.get('items', [])] == chunk
@@ -57,6 +57,9 @@ document.addEventListener('DOMContentLoaded', function() {
             setupAISettings();
             addButtonFeedback();
             addSmoothScrolling();
+            if (window.location.pathname === '/dashboard') {
+                subscribeToPlaybackStream();
+            }
             log('All initialization functions completed');
             
             // Show Lightning mode (hyper fast) status
@@ -167,56 +170,145 @@ function refreshTrackInfo() {
 }
 
 function updateTrackInfoViaAjax() {
+    // The playback stream already pushes changes; the server polls right after control actions
+    if (playbackStream && playbackStream.readyState === EventSource.OPEN) {
+        return;
+    }
+    
     fetch('/api/current-track')
         .then(response => response.json())
-        .then(data => {
-            if (data.current_track && data.current_track.item) {
-                const track = data.current_track.item;
-                const playbackState = data.playback_state;
-                
-                // Update track name
-                const trackNameEl = document.querySelector('.current-track h5');
-                if (trackNameEl) trackNameEl.textContent = track.name;
-                
-                // Update artist names
-                const artistEl = document.querySelector('.current-track p:first-of-type');
-                if (artistEl) {
-                    artistEl.textContent = track.artists.map(artist => artist.name).join(', ');
-                }
-                
-                // Update album name
-                const albumEl = document.querySelector('.current-track p.text-muted');
-                if (albumEl) albumEl.textContent = track.album.name;
-                
-                // Update album artwork
-                const imgEl = document.querySelector('.current-track img');
-                if (imgEl && track.album.images && track.album.images.length > 0) {
-                    imgEl.src = track.album.images[0].url;
-                }
-                
-                // Update play/pause button
-                const playPauseBtn = document.getElementById('playPauseBtn');
-                const icon = playPauseBtn?.querySelector('i');
-                if (icon && playbackState) {
-                    icon.classList.remove('fa-play', 'fa-pause');
-                    icon.classList.add(playbackState.is_playing ? 'fa-pause' : 'fa-play');
-                }
-                
-                // Update progress bar
-                if (playbackState && playbackState.progress_ms && track.duration_ms) {
-                    const progressBar = document.querySelector('.progress-bar');
-                    if (progressBar) {
-                        const percentage = (playbackState.progress_ms / track.duration_ms) * 100;
-                        progressBar.style.width = `${percentage}%`;
-                    }
-                }
-            }
-        })
+        .then(data => renderTrackInfo(data))
         .catch(error => {
             log('Failed to update track info:', error, 'error');
         });
 }
 
+// Playback state pushed over Server-Sent Events, shared by every open tab
+let playbackStream = null;
+let playbackSnapshot = null;
+let playbackPollTimer = null;
+const PLAYBACK_FALLBACK_POLL_MS = 15000;
+const PLAYBACK_STREAM_RETRY_MS = 60000;
+
+function mergePlaybackDiff(target, changes) {
+    if (!target || typeof target !== 'object' || Array.isArray(target)) {
+        return changes;
+    }
+    
+    Object.keys(changes).forEach(key => {
+        const value = changes[key];
+        if (value === null) {
+            delete target[key];
+        } else if (typeof value === 'object' && !Array.isArray(value)) {
+            target[key] = mergePlaybackDiff(target[key], value);
+        } else {
+            target[key] = value;
+        }
+    });
+    return target;
+}
+
+function subscribeToPlaybackStream() {
+    if (!window.EventSource || playbackStream) {
+        return;
+    }
+    
+    log('Subscribing to playback stream');
+    playbackStream = new EventSource('/api/current-track/stream');
+    
+    playbackStream.addEventListener('snapshot', event => {
+        playbackSnapshot = JSON.parse(event.data);
+        renderTrackInfo(playbackSnapshot);
+    });
+    
+    playbackStream.addEventListener('diff', event => {
+        if (!playbackSnapshot) return;
+        playbackSnapshot = mergePlaybackDiff(playbackSnapshot, JSON.parse(event.data));
+        renderTrackInfo(playbackSnapshot);
+    });
+    
+    playbackStream.addEventListener('busy', () => {
+        log('Playback stream busy, polling instead', 'warn');
+        fallBackToPlaybackPolling();
+    });
+    
+    playbackStream.addEventListener('error', event => {
+        if (event.data) {
+            log('Playback stream error: ' + event.data, 'warn');
+        }
+        // The browser gives up reconnecting after a non-200 answer such as 503
+        if (playbackStream && playbackStream.readyState === EventSource.CLOSED) {
+            fallBackToPlaybackPolling();
+        }
+    });
+}
+
+function fallBackToPlaybackPolling() {
+    if (playbackStream) {
+        playbackStream.close();
+        playbackStream = null;
+    }
+    if (playbackPollTimer) {
+        return;
+    }
+    
+    updateTrackInfoViaAjax();
+    playbackPollTimer = setInterval(updateTrackInfoViaAjax, PLAYBACK_FALLBACK_POLL_MS);
+    setTimeout(() => {
+        clearInterval(playbackPollTimer);
+        playbackPollTimer = null;
+        subscribeToPlaybackStream();
+    }, PLAYBACK_STREAM_RETRY_MS);
+}
+
+window.addEventListener('beforeunload', () => {
+    if (playbackStream) playbackStream.close();
+});
+
+function renderTrackInfo(data) {
+    if (data.current_track && data.current_track.item) {
+        const track = data.current_track.item;
+        const playbackState = data.playback_state;
+        
+        // Update track name
+        const trackNameEl = document.querySelector('.current-track h5');
+        if (trackNameEl) trackNameEl.textContent = track.name;
+        
+        // Update artist names
+        const artistEl = document.querySelector('.current-track p:first-of-type');
+        if (artistEl) {
+            artistEl.textContent = track.artists.map(artist => artist.name).join(', ');
+        }
+        
+        // Update album name
+        const albumEl = document.querySelector('.current-track p.text-muted');
+        if (albumEl) albumEl.textContent = track.album.name;
+        
+        // Update album artwork
+        const imgEl = document.querySelector('.current-track img');
+        if (imgEl && track.album.images && track.album.images.length > 0) {
+            imgEl.src = track.album.images[0].url;
+        }
+        
+        // Update play/pause button
+        const playPauseBtn = document.getElementById('playPauseBtn');
+        const icon = playPauseBtn?.querySelector('i');
+        if (icon && playbackState) {
+            icon.classList.remove('fa-play', 'fa-pause');
+            icon.classList.add(playbackState.is_playing ? 'fa-pause' : 'fa-play');
+        }
+        
+        // Update progress bar
+        if (playbackState && playbackState.progress_ms && track.duration_ms) {
+            const progressBar = document.querySelector('.progress-bar');
+            if (progressBar) {
+                const percentage = (playbackState.progress_ms / track.duration_ms) * 100;
+                progressBar.style.width = `${percentage}%`;
+            }
+        }
+    }
+}
+
 function isTrackPlaying() {
     // Check if there's a pause button (indicating music is playing)
     const pauseButton = document.querySelector('a[href*="/pause"]');
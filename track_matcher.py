@@ -0,0 +1,229 @@
+import re
+import logging
+import unicodedata
+from collections import namedtuple
+
+SelectedResult = namedtuple('SelectedResult', [
+    'track_id', 'track_name', 'artist_name', 'album_name', 'album_image_url',
+    'track_uri', 'external_url', 'preview_url', 'match_score', 'reasoning'
+])
+SelectionResult = namedtuple('SelectionResult', ['selected_result', 'confidence'])
+
+TITLE_WEIGHT = 0.6
+ARTIST_WEIGHT = 0.4
+# Candidates of different songs scoring within this margin are a tie
+TIE_MARGIN = 0.03
+# Live/remix/cover versions lose to the studio recording unless asked for
+VARIANT_PENALTY = 0.08
+
+_FEATURING = re.compile(r'\s*[\(\[](?:feat|ft|featuring|with)\b.*$|\s+(?:feat|ft|featuring)\b\.?\s.*$', re.IGNORECASE)
+# "(Remastered 2011)", "- Radio Edit", "[Deluxe Edition]" and similar release noise
+_RELEASE_SUFFIX = re.compile(
+    r'\s*(?:[\(\[][^\)\]]*\b(?:remaster(?:ed)?|version|edit|mono|stereo|deluxe|edition|explicit|bonus|anniversary)\b[^\)\]]*[\)\]]'
+    r'|\s-\s.*\b(?:remaster(?:ed)?|version|edit|mono|stereo|deluxe|edition|explicit|bonus|anniversary)\b.*$)',
+    re.IGNORECASE
+)
+_VARIANT = re.compile(r'\b(?:live|remix|mix|acoustic|instrumental|karaoke|cover|demo|sped up|slowed)\b', re.IGNORECASE)
+_NON_WORD = re.compile(r'[^\w\s]')
+_SPACES = re.compile(r'\s+')
+
+
+def _fold(text):
+    """Lowercase, strip diacritics and punctuation, collapse whitespace"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = text.lower().replace('&', ' and ')
+    return _SPACES.sub(' ', _NON_WORD.sub(' ', text)).strip()
+
+
+def normalize_title(title):
+    """Reduce a track title to the part that identifies the song"""
+    title = _RELEASE_SUFFIX.sub('', title or '')
+    title = _FEATURING.sub('', title)
+    return _fold(title)
+
+
+def normalize_artist(artist):
+    return _fold(re.sub(r'^the\s+', '', (artist or '').strip(), flags=re.IGNORECASE))
+
+
+def levenshtein(a, b):
+    """Edit distance using Hyyrö's bit-parallel algorithm.
+
+    Each character of the longer string costs a handful of integer
+    operations regardless of the shorter string's length, which keeps
+    scoring ten search results in the tens of microseconds.
+    """
+    if a == b:
+        return 0
+    if len(a) > len(b):
+        a, b = b, a
+    if not a:
+        return len(b)
+
+    m = len(a)
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    peq = {}
+    for i, c in enumerate(a):
+        peq[c] = peq.get(c, 0) | (1 << i)
+
+    pv, mv, score = full, 0, m
+    for c in b:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+    return score
+
+
+def similarity(a, b):
+    """0..1 similarity of two normalized strings"""
+    if a == b:
+        return 1.0 if a else 0.0
+    if not a or not b:
+        return 0.0
+    ratio = 1.0 - levenshtein(a, b) / max(len(a), len(b))
+    # "Testify" vs "Testify Live at ..." style containment is a near match
+    if (f' {a} ' in f' {b} ') or (f' {b} ' in f' {a} '):
+        ratio = max(ratio, 0.9)
+    return ratio
+
+
+def score_track(track, wanted_title, wanted_artist):
+    """Score one Spotify track object against the normalized wanted title/artist"""
+    title_score = similarity(normalize_title(track.get('name')), wanted_title)
+    artist_score = max(
+        (similarity(normalize_artist(artist.get('name')), wanted_artist) for artist in track.get('artists') or []),
+        default=0.0
+    )
+    score = TITLE_WEIGHT * title_score + ARTIST_WEIGHT * artist_score
+    # Karaoke and tribute releases often reuse the exact title, so check artist and album too
+    variant_text = ' '.join([track.get('name') or '', (track.get('album') or {}).get('name') or '']
+                            + [artist.get('name') or '' for artist in track.get('artists') or []])
+    if _VARIANT.search(variant_text) and not _VARIANT.search(wanted_title):
+        score -= VARIANT_PENALTY
+    return max(score, 0.0)
+
+
+def _to_selected(track, match_score, reasoning):
+    album = track.get('album') or {}
+    images = album.get('images') or []
+    return SelectedResult(
+        track_id=track.get('id'),
+        track_name=track.get('name'),
+        artist_name=(track.get('artists') or [{}])[0].get('name'),
+        album_name=album.get('name'),
+        album_image_url=images[0].get('url') if images else None,
+        track_uri=track.get('uri'),
+        external_url=(track.get('external_urls') or {}).get('spotify'),
+        preview_url=track.get('preview_url'),
+        match_score=round(match_score, 3),
+        reasoning=reasoning
+    )
+
+
+def _song_key(track):
+    return (normalize_title(track.get('name')), normalize_artist((track.get('artists') or [{}])[0].get('name')))
+
+
+def _ask_llm(model, song_title, artist_name, candidates):
+    """Let the LLM break a tie between different songs; returns an index into candidates"""
+    options = '\n'.join(
+        f"{i + 1}. \"{track.get('name')}\" by {', '.join(a.get('name', '') for a in track.get('artists') or [])}"
+        f" ({(track.get('album') or {}).get('name', 'unknown album')})"
+        for i, (track, _score) in enumerate(candidates)
+    )
+    prompt = f"""Which Spotify result is the song "{song_title}" by {artist_name}?
+
+{options}
+
+Reply with the number only."""
+    response = model.generate_content(prompt)
+    choice = int(re.search(r'\d+', response.text).group()) - 1
+    if not 0 <= choice < len(candidates):
+        raise ValueError(f"LLM chose out-of-range option {choice + 1}")
+    return choice
+
+
+def select_spotify_result(song_title, artist_name, tracks, model=None):
+    """Pick the search result that best matches the recommended song.
+
+    Results are ranked locally by normalized title/artist similarity, with
+    popularity breaking exact ties between releases of the same song. Only
+    when different songs score within TIE_MARGIN of each other, and a model
+    is given, is the LLM asked to choose between them.
+    """
+    tracks = [track for track in tracks or [] if track]
+    if not tracks:
+        raise ValueError("No search results to select from")
+
+    wanted_title = normalize_title(song_title)
+    wanted_artist = normalize_artist(artist_name)
+    ranked = sorted(
+        ((track, score_track(track, wanted_title, wanted_artist)) for track in tracks),
+        key=lambda item: (item[1], item[0].get('popularity') or 0),
+        reverse=True
+    )
+    best_track, best_score = ranked[0]
+
+    # Other releases of the same song are not competitors, only different songs are
+    best_key = _song_key(best_track)
+    rivals = [(track, score) for track, score in ranked[1:] if _song_key(track) != best_key]
+    margin = best_score - rivals[0][1] if rivals else 1.0
+    confidence = best_score * min(1.0, 0.5 + margin * 5)
+    reasoning = f"Local match: title/artist similarity {best_score:.2f}, margin {margin:.2f} over the next song"
+
+    if margin < TIE_MARGIN and model is not None:
+        tied = [ranked[0]] + [item for item in rivals if best_score - item[1] < TIE_MARGIN]
+        try:
+            best_track, best_score = tied[_ask_llm(model, song_title, artist_name, tied)]
+            confidence = max(confidence, 0.8 * best_score)
+            reasoning = f"LLM broke a tie between {len(tied)} similarly scored results"
+        except Exception as e:
+            logging.warning(f"LLM tie-break failed, keeping the top local match: {e}")
+
+    return SelectionResult(_to_selected(best_track, best_score, reasoning), round(confidence, 3))
+
+
+def _benchmark_results():
+    def track(name, artist, album, popularity):
+        return {'id': name, 'name': name, 'artists': [{'name': artist}], 'album': {'name': album, 'images': []},
+                'uri': f'spotify:track:{name}', 'external_urls': {}, 'popularity': popularity}
+    return [
+        track('Testify - Live', 'Rage Against The Machine', 'Live & Rare', 40),
+        track('Testify', 'Rage Against The Machine', 'The Battle Of Los Angeles', 70),
+        track('Testify - Remastered 2020', 'Rage Against The Machine', 'The Battle Of Los Angeles (Deluxe)', 55),
+        track('Testify', 'Parliament', 'Up For The Down Stroke', 30),
+        track('Testify (feat. Common)', 'Stereo MCs', 'Testify', 20),
+        track('Guerrilla Radio', 'Rage Against The Machine', 'The Battle Of Los Angeles', 75),
+        track('Testifyin', 'Rage Against The Machine Tribute', 'Tribute', 5),
+        track('Testify', 'Rage Against The Machine Karaoke', 'Karaoke Hits', 1),
+        track('Sleep Now In The Fire', 'Rage Against The Machine', 'The Battle Of Los Angeles', 68),
+        track('Testify', 'Needtobreathe', 'Rivers In The Wasteland', 45),
+    ]
+
+
+if __name__ == '__main__':
+    import time
+
+    results = _benchmark_results()
+    selection = select_spotify_result('Testify', 'Rage Against The Machine', results)
+    print(f"Selected '{selection.selected_result.track_name}' from '{selection.selected_result.album_name}' "
+          f"(match {selection.selected_result.match_score}, confidence {selection.confidence})")
+
+    iterations = 2000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        select_spotify_result('Testify', 'Rage Against The Machine', results)
+    elapsed = time.perf_counter() - start
+    print(f"{elapsed / iterations * 1e6:.0f} us per selection over {len(results)} results")
@@ -0,0 +1,184 @@
+import re
+from collections import namedtuple
+
+ParsedTrack = namedtuple('ParsedTrack', ['song_title', 'artist_name', 'confidence', 'pattern'])
+
+# Below this confidence callers should confirm with the LLM parser
+PARSE_CONFIDENCE_THRESHOLD = 0.7
+
+_QUOTES = '"“”„«»'
+_DASHES = r'(?:\s[-–—]\s)'
+_LIST_PREFIX = re.compile(r'^\s*(?:[-*•]|\d+[.)])\s+')
+
+# An artist name runs until punctuation that ends a clause or a connecting word
+_ARTIST_END = re.compile(
+    r'(?:[?!,;:()\[\]\n"“”*]|(?<![A-Z])\.(?=\s|$)|' + _DASHES + r'|'
+    r'\s(?:is|was|will|would|has|have|brings|because|which|that|who|from|off|on|in|with|and it|feat\.?|ft\.?)\s)',
+)
+
+# A line that is only '"Title" by Artist' (the playlist prompt's format) keeps
+# the whole rest as the artist, so "Earth, Wind & Fire" and "Panic! At The
+# Disco" stay intact; only asides and featured artists end it
+_LINE_ARTIST_END = re.compile(
+    r'(?:[()\[\]\n"“”*]|[,;:?!](?=\s+[a-z])|' + _DASHES + r'|\s(?i:feat\.?|ft\.?|featuring)\s)'
+)
+
+# "R.E.M.", "B.B." - a trailing dot after a lone initial
+_INITIALISM_END = re.compile(r'(?:^|[\s.])[A-Za-z]\.$')
+
+_PATTERNS = [
+    ('labels', 0.98, re.compile(
+        r'SONG:\s*(?P<title>[^\n]+?)\s*\n\s*ARTIST:\s*(?P<artist>[^\n]+)', re.IGNORECASE)),
+    ('bold_quoted_by', 0.95, re.compile(
+        r'\*\*\s*[' + _QUOTES + r'](?P<title>[^' + _QUOTES + r'\n]{1,120})[' + _QUOTES + r']\s*\*\*\s+by\s+(?P<artist>[^\n]+)',
+        re.IGNORECASE)),
+    ('quoted_by', 0.95, re.compile(
+        r'[' + _QUOTES + r'](?P<title>[^' + _QUOTES + r'\n]{1,120})[' + _QUOTES + r']\s*,?\s+by\s+(?P<artist>[^\n]+)',
+        re.IGNORECASE)),
+    ('bold_by', 0.9, re.compile(
+        r'\*\*(?P<title>[^*\n]{1,120})\*\*\s+by\s+(?P<artist>[^\n]+)', re.IGNORECASE)),
+    ('quoted_dash', 0.8, re.compile(
+        r'[' + _QUOTES + r'](?P<title>[^' + _QUOTES + r'\n]{1,120})[' + _QUOTES + r']' + _DASHES + r'(?P<artist>[^\n]+)')),
+    ('bold_dash', 0.8, re.compile(
+        r'\*\*(?P<title>[^*\n]{1,120})\*\*' + _DASHES + r'(?P<artist>[^\n]+)')),
+]
+
+# Bare "Title by Artist" / "Title - Artist" are only trusted on short lines
+_BARE_BY = re.compile(r'^(?P<title>[^\n]{1,80}?)\s+by\s+(?P<artist>[^\n]{1,80})$', re.IGNORECASE)
+_BARE_DASH = re.compile(r'^(?P<title>[^\n]{1,80}?)' + _DASHES + r'(?P<artist>[^\n]{1,80})$')
+
+
+def _clean_title(title):
+    return title.strip().strip('*_' + _QUOTES + "'‘’").strip()
+
+
+def _clean_artist(artist, whole_line=False):
+    artist = artist.strip().lstrip('*_').strip()
+    match = (_LINE_ARTIST_END if whole_line else _ARTIST_END).search(artist)
+    if match:
+        artist = artist[:match.start()]
+    artist = artist.strip().strip('*_' + _QUOTES + "'")
+    # A sentence's full stop goes, but the last dot of "R.E.M." is part of the name
+    if artist.endswith('.') and not _INITIALISM_END.search(artist):
+        artist = artist.rstrip('.')
+    return artist.strip()
+
+
+def _score(confidence, title, artist):
+    # Long "artists" usually mean the terminator was missed and a sentence leaked in
+    if len(artist.split()) > 6:
+        confidence -= 0.25
+    if len(title.split()) > 12:
+        confidence -= 0.2
+    return round(max(confidence, 0.0), 2)
+
+
+def parse_track_line(line):
+    """Parse a single line such as a playlist entry; returns ParsedTrack or None"""
+    line = _LIST_PREFIX.sub('', line.strip())
+    if not line:
+        return None
+
+    for name, confidence, pattern in _PATTERNS:
+        match = pattern.search(line)
+        if match:
+            whole_line = name == 'quoted_by' and match.start() == 0
+            title, artist = _clean_title(match.group('title')), _clean_artist(match.group('artist'), whole_line)
+            if title and artist:
+                return ParsedTrack(title, artist, _score(confidence, title, artist), name)
+
+    for name, confidence, pattern in (('bare_by', 0.65, _BARE_BY), ('bare_dash', 0.6, _BARE_DASH)):
+        match = pattern.match(line)
+        if match:
+            title, artist = _clean_title(match.group('title')), _clean_artist(match.group('artist'))
+            if title and artist:
+                return ParsedTrack(title, artist, _score(confidence, title, artist), name)
+    return None
+
+
+def parse_recommendation(text):
+    """Extract the recommended track from free-form LLM text.
+
+    The first confident match wins, since models name their pick before
+    comparing it to other songs. Returns ParsedTrack or None.
+    """
+    if not text:
+        return None
+
+    labeled = _PATTERNS[0][2].search(text)
+    if labeled:
+        title, artist = _clean_title(labeled.group('title')), _clean_artist(labeled.group('artist'))
+        if title and artist:
+            return ParsedTrack(title, artist, _PATTERNS[0][1], 'labels')
+
+    best = None
+    for line in text.splitlines():
+        parsed = parse_track_line(line)
+        if parsed is None:
+            continue
+        if parsed.confidence >= PARSE_CONFIDENCE_THRESHOLD:
+            return parsed
+        if best is None or parsed.confidence > best.confidence:
+            best = parsed
+    return best
+
+
+BENCHMARK_CORPUS = [
+    ('"Testify" by Rage Against The Machine - it has the raw, politically charged aggression you love.',
+     ('Testify', 'Rage Against The Machine')),
+    ('Okay, so "Testify" by Rage Against The Machine? I think you\'re going to *love* this one.',
+     ('Testify', 'Rage Against The Machine')),
+    ('I recommend “Born For This” by The Score. It matches your recent high-energy rotation.',
+     ('Born For This', 'The Score')),
+    ('**"Chop Suey!"** by **System Of A Down**\n\nThis track balances chaos and melody.',
+     ('Chop Suey!', 'System Of A Down')),
+    ('**Numb** by Linkin Park is a perfect fit for your nu-metal phase.',
+     ('Numb', 'Linkin Park')),
+    ('1. "Time in a Bottle" by Jim Croce', ('Time in a Bottle', 'Jim Croce')),
+    ('"September" by Earth, Wind & Fire', ('September', 'Earth, Wind & Fire')),
+    ('3. "High Hopes" by Panic! At The Disco', ('High Hopes', 'Panic! At The Disco')),
+    ('"EARFQUAKE" by Tyler, The Creator', ('EARFQUAKE', 'Tyler, The Creator')),
+    ('"Ohio" by Crosby, Stills, Nash & Young', ('Ohio', 'Crosby, Stills, Nash & Young')),
+    ('"Would?" by Alice in Chains', ('Would?', 'Alice in Chains')),
+    ('2. "Freak On a Leash" - Korn', ('Freak On a Leash', 'Korn')),
+    ('**Monster** – Skillet', ('Monster', 'Skillet')),
+    ('SONG: Losing My Religion\nARTIST: R.E.M.', ('Losing My Religion', 'R.E.M.')),
+    ('If you want something gentler, try "Everybody Hurts" by R.E.M.', ('Everybody Hurts', 'R.E.M.')),
+    ('Duality by Slipknot', ('Duality', 'Slipknot')),
+    ('Watch You Crawl - Falling In Reverse', ('Watch You Crawl', 'Falling In Reverse')),
+    ('You should try "Bohemian Rhapsody" by Queen, which mixes opera with hard rock.',
+     ('Bohemian Rhapsody', 'Queen')),
+    ('Based on your taste, "Black Hole Sun" by Soundgarden brings that same brooding grunge energy.',
+     ('Black Hole Sun', 'Soundgarden')),
+    ('- "Hurt" by Nine Inch Nails (the original, not the cover)', ('Hurt', 'Nine Inch Nails')),
+]
+
+
+def run_benchmark(iterations=2000):
+    """Time parse_recommendation over the corpus and report accuracy and confidence"""
+    import time
+
+    correct = 0
+    confident = 0
+    for text, (expected_title, expected_artist) in BENCHMARK_CORPUS:
+        parsed = parse_recommendation(text)
+        ok = bool(parsed) and parsed.song_title == expected_title and parsed.artist_name == expected_artist
+        correct += ok
+        confident += bool(parsed) and parsed.confidence >= PARSE_CONFIDENCE_THRESHOLD
+        print(f"{'OK ' if ok else 'BAD'} {parsed.confidence if parsed else 0:.2f} "
+              f"{parsed.pattern if parsed else '-':15} {text[:60]!r}")
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for text, _expected in BENCHMARK_CORPUS:
+            parse_recommendation(text)
+    elapsed = time.perf_counter() - start
+    per_parse_us = elapsed / (iterations * len(BENCHMARK_CORPUS)) * 1e6
+
+    print(f"\n{correct}/{len(BENCHMARK_CORPUS)} parsed correctly, "
+          f"{confident}/{len(BENCHMARK_CORPUS)} above the {PARSE_CONFIDENCE_THRESHOLD} LLM-fallback threshold")
+    print(f"{per_parse_us:.1f} us per parse ({iterations * len(BENCHMARK_CORPUS)} parses in {elapsed:.2f}s)")
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,115 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from track_parser import parse_track_line
+from track_matcher import select_spotify_result
+from catalog import catalog
+
+# Resolution runs on its own pool, so a large playlist never takes the shared
+# fan-out threads that insights and Lightning depend on. Each playlist keeps
+# at most PLAYLIST_RESOLVE_WINDOW searches in flight, so two playlists can
+# make progress side by side.
+PLAYLIST_RESOLVE_WORKERS = int(os.environ.get('PLAYLIST_RESOLVE_WORKERS', 8))
+PLAYLIST_RESOLVE_WINDOW = int(os.environ.get('PLAYLIST_RESOLVE_WINDOW', 4))
+PLAYLIST_RESOLVE_DEADLINE = float(os.environ.get('PLAYLIST_RESOLVE_DEADLINE', 20.0))
+SEARCH_CANDIDATES = 5
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_resolve_executor():
+    """Return the thread pool dedicated to playlist track resolution"""
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(
+                    max_workers=PLAYLIST_RESOLVE_WORKERS,
+                    thread_name_prefix='playlist-resolve'
+                )
+                _executor_pid = pid
+    return _executor
+
+
+def _search_items(spotify_client, query):
+    results = spotify_client.search_tracks(query, limit=SEARCH_CANDIDATES)
+    return (results or {}).get('tracks', {}).get('items') or []
+
+
+def resolve_track_line(spotify_client, line):
+    """Resolve one AI-suggested line to a Spotify track object, or None"""
+    parsed = parse_track_line(line)
+    if parsed is None:
+        logging.warning(f"Could not parse track line: {line}")
+        return None
+
+    catalog_track = catalog.find_track(parsed.song_title, parsed.artist_name, spotify_client.get_market())
+    if catalog_track:
+        return catalog_track
+
+    items = _search_items(spotify_client, f'track:"{parsed.song_title}" artist:"{parsed.artist_name}"')
+    if not items:
+        # Field filters miss alternate spellings; a plain query is more forgiving
+        items = _search_items(spotify_client, f"{parsed.song_title} {parsed.artist_name}")
+    if not items:
+        logging.warning(f"Could not find track: {parsed.song_title} by {parsed.artist_name}")
+        return None
+
+    selected = select_spotify_result(parsed.song_title, parsed.artist_name, items).selected_result
+    return next(item for item in items if item.get('uri') == selected.track_uri)
+
+
+def iter_resolved_tracks(spotify_client, track_lines, limit=None,
+                         window=PLAYLIST_RESOLVE_WINDOW, deadline=PLAYLIST_RESOLVE_DEADLINE):
+    """Resolve AI-suggested track lines concurrently, yielding tracks in line order.
+
+    Up to ``window`` searches run at once on the resolution pool, under the
+    shared rate limiter. ``track_lines`` may be any iterable, so lines are
+    consumed only as the window has room. Duplicate tracks are skipped.
+    Iteration stops after ``limit`` tracks or once ``deadline`` seconds pass,
+    and any searches still queued are cancelled.
+    """
+    executor = get_resolve_executor()
+    lines = iter(track_lines)
+    pending = deque()
+    seen_uris = set()
+    found = 0
+    give_up_at = time.monotonic() + deadline
+
+    def fill():
+        while len(pending) < window:
+            line = next(lines, None)
+            if line is None:
+                return
+            pending.append((line, executor.submit(resolve_track_line, spotify_client, line)))
+
+    try:
+        fill()
+        while pending:
+            line, future = pending.popleft()
+            try:
+                track = future.result(timeout=max(0.0, give_up_at - time.monotonic()))
+            except FutureTimeoutError:
+                logging.warning(f"Track resolution missed the {deadline:.0f}s deadline with {len(pending) + 1} lines pending")
+                return
+            except Exception as e:
+                logging.error(f"Error resolving track line '{line}': {e}")
+                track = None
+
+            if track and track.get('uri') not in seen_uris:
+                seen_uris.add(track['uri'])
+                found += 1
+                yield track
+                if limit is not None and found >= limit:
+                    return
+            fill()
+    finally:
+        for _line, future in pending:
+            future.cancel()
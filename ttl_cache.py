@@ -0,0 +1,115 @@
+import sys
+import json
+import time
+import threading
+from collections import OrderedDict
+
+# Sentinel returned by TTLCache.get() on a miss, so None can be cached
+MISSING = object()
+
+
+def estimate_size(value):
+    """Approximate the memory held by a cached value in bytes.
+    
+    Cached values are Spotify/JSON payloads, so their serialized length is a
+    cheap and stable proxy; anything else falls back to sys.getsizeof.
+    """
+    try:
+        return len(json.dumps(value, separators=(',', ':'), default=str))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-key TTL and a memory cap in bytes"""
+    
+    def __init__(self, max_bytes, default_ttl=300, name='cache'):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.name = name
+        self.entries = OrderedDict()  # key -> (value, expires_at, size)
+        self.memory_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def _remove(self, key):
+        value, expires_at, size = self.entries.pop(key)
+        self.memory_bytes -= size
+    
+    def get(self, key, default=MISSING):
+        """Return the cached value, or ``default`` if missing or expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            
+            value, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key, value, ttl=None, size=None):
+        """Store a value for ``ttl`` seconds, evicting least recently used entries over the cap"""
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return False
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return False
+        
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, time.monotonic() + ttl, size)
+            self.memory_bytes += size
+            
+            while self.memory_bytes > self.max_bytes and self.entries:
+                oldest_key = next(iter(self.entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+        return True
+    
+    def delete(self, key):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+                return True
+            return False
+    
+    def delete_where(self, predicate):
+        """Drop every entry whose key matches ``predicate``; returns the number removed"""
+        with self.lock:
+            doomed = [key for key in self.entries if predicate(key)]
+            for key in doomed:
+                self._remove(key)
+            return len(doomed)
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.memory_bytes = 0
+    
+    def get_stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'entries': len(self.entries),
+                'memory_bytes': self.memory_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }